@@ -3,88 +3,102 @@ AI-powered price forecasting using Claude API
 Analyzes historical price data and generates predictions with reasoning
 """
 import os
-from typing import Dict, List, Optional, Any
+import asyncio
+import hashlib
+import struct
+import time
+from collections import OrderedDict
+from statistics import fmean
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, select
 from sqlalchemy.orm import Session
-from database import PriceHistory, APYHistory, PriceForecast, SessionLocal
+from database import PriceHistory, APYHistory, PriceForecast, SessionLocal, bulk_insert
+from defillama_client import ETHERFI_CONTRACTS
 import json
 
-
-class ClaudeForecastingService:
-    """Service for AI-powered price forecasting using Claude"""
-
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            print("Warning: ANTHROPIC_API_KEY not set - forecasting will not work")
-        self.model = "claude-sonnet-4-5-20250929"
-
-    def _get_historical_data(self, db: Session, product: str, days: int = 90) -> List[Dict[str, Any]]:
-        """Fetch historical price data from database"""
-        cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
-
-        prices = db.query(PriceHistory).filter(
-            PriceHistory.product == product,
-            PriceHistory.timestamp >= cutoff_timestamp
-        ).order_by(PriceHistory.timestamp.asc()).all()
-
-        return [
-            {
-                "timestamp": p.timestamp,
-                "date": datetime.fromtimestamp(p.timestamp).strftime("%Y-%m-%d"),
-                "price": p.price
-            }
-            for p in prices
-        ]
-
-    def _get_apy_history(self, db: Session, product: str, days: int = 30) -> List[Dict[str, Any]]:
-        """Fetch historical APY data from database"""
-        cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
-
-        apys = db.query(APYHistory).filter(
-            APYHistory.product == product,
-            APYHistory.timestamp >= cutoff_timestamp
-        ).order_by(APYHistory.timestamp.asc()).all()
-
-        return [
-            {
-                "timestamp": a.timestamp,
-                "date": datetime.fromtimestamp(a.timestamp).strftime("%Y-%m-%d"),
-                "apy_total": a.apy_total,
-                "tvl_usd": a.tvl_usd
-            }
-            for a in apys
-        ]
-
-    def _build_analysis_prompt(
-        self,
-        product: str,
-        price_history: List[Dict[str, Any]],
-        apy_history: List[Dict[str, Any]],
-        forecast_days: int
-    ) -> str:
-        """Build Claude prompt for price forecasting"""
-
-        # Calculate basic statistics
-        prices = [p["price"] for p in price_history if p["price"]]
-        if not prices:
-            return ""
-
-        current_price = prices[-1]
-        avg_price = sum(prices) / len(prices)
-        min_price = min(prices)
-        max_price = max(prices)
-        volatility = (max_price - min_price) / avg_price * 100
-
-        # Recent trend
-        if len(prices) >= 7:
-            recent_avg = sum(prices[-7:]) / 7
-            older_avg = sum(prices[-14:-7]) / 7 if len(prices) >= 14 else avg_price
-            trend_pct = ((recent_avg - older_avg) / older_avg * 100) if older_avg else 0
-        else:
-            trend_pct = 0
-
-        prompt = f"""You are an expert DeFi analyst specializing in Ethereum liquid staking derivatives. Analyze the following data for {product} and provide a price forecast.
+try:
+    from anthropic import AsyncAnthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+
+# Cache for generated forecasts (avoid redundant Claude calls on unchanged data).
+# One bucket per product/horizon/model, oldest entry first, so near-match scans stay small
+_forecast_cache: Dict[str, "OrderedDict[str, Tuple[datetime, Tuple[float, ...], Dict[str, Any]]]"] = {}
+FORECAST_CACHE_TTL = timedelta(hours=6)
+FORECAST_CACHE_PER_BUCKET = 8  # Most recent input variants kept per product/horizon/model
+
+# Near-match tolerances for reusing a forecast whose inputs barely moved
+NEAR_MATCH_PRICE_PCT = 0.5  # Max % change in current/average price
+NEAR_MATCH_STAT_PTS = 0.5  # Max absolute change in volatility/trend (percentage points)
+
+RECENT_PRICE_POINTS = 14  # Latest points needed for the 7-day trend vs. the prior week
+
+# Statements built once and reused with bound parameters (product, cutoff)
+_PRICE_WINDOW = (
+    PriceHistory.product == bindparam("product"),
+    PriceHistory.timestamp >= bindparam("cutoff"),
+    PriceHistory.price > 0
+)
+_PRICE_SUMMARY_STMT = select(
+    func.count(),
+    func.min(PriceHistory.price),
+    func.max(PriceHistory.price),
+    func.avg(PriceHistory.price)
+).where(*_PRICE_WINDOW)
+_RECENT_PRICES_STMT = (
+    select(PriceHistory.timestamp, PriceHistory.price)
+    .where(*_PRICE_WINDOW)
+    .order_by(PriceHistory.timestamp.desc())
+    .limit(RECENT_PRICE_POINTS)
+)
+_APY_HISTORY_STMT = select(APYHistory.timestamp, APYHistory.apy_total, APYHistory.tvl_usd).where(
+    APYHistory.product == bindparam("product"),
+    APYHistory.timestamp >= bindparam("cutoff")
+).order_by(APYHistory.timestamp.asc())
+
+# Tool definition used to get the forecast back as structured JSON (no text parsing)
+_HORIZON_SCHEMA = {
+    "type": "object",
+    "properties": {"price": {"type": "number"}, "confidence": {"type": "number"}},
+    "required": ["price", "confidence"]
+}
+_STRING_LIST_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+FORECAST_TOOL = {
+    "name": "record_forecast",
+    "description": "Record the structured price forecast for the product.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "current_analysis": {
+                "type": "object",
+                "properties": {
+                    "trend": {"type": "string", "enum": ["bullish", "bearish", "neutral"]},
+                    "confidence": {"type": "number"},
+                    "key_factors": _STRING_LIST_SCHEMA
+                }
+            },
+            "forecast": {
+                "type": "object",
+                "properties": {
+                    "7_day": _HORIZON_SCHEMA,
+                    "30_day": _HORIZON_SCHEMA,
+                    "90_day": _HORIZON_SCHEMA
+                }
+            },
+            "scenarios": {"type": "object"},
+            "reasoning": {"type": "string"},
+            "risk_factors": _STRING_LIST_SCHEMA,
+            "opportunities": _STRING_LIST_SCHEMA
+        },
+        "required": ["current_analysis", "forecast", "reasoning"]
+    }
+}
+
+# Static prompt for price forecasting; filled in per request by _build_analysis_prompt
+ANALYSIS_PROMPT_TEMPLATE = """You are an expert DeFi analyst specializing in Ethereum liquid staking derivatives. Analyze the following data for {product} and provide a price forecast.
 
 ## Product Context
 {product} is an ether.fi liquid staking token. Key characteristics:
@@ -93,7 +107,7 @@ class ClaudeForecastingService:
 - ETHFI: Governance and utility token for the ether.fi protocol
 - eBTC: Bitcoin liquid staking token
 
-## Historical Price Data (Last {len(price_history)} days)
+## Historical Price Data (Last {history_days} days)
 Current Price: ${current_price:.2f}
 Average Price: ${avg_price:.2f}
 Price Range: ${min_price:.2f} - ${max_price:.2f}
@@ -101,10 +115,10 @@ Volatility: {volatility:.2f}%
 Recent 7-day Trend: {trend_pct:+.2f}%
 
 Recent Price Points (last 10 days):
-{json.dumps(price_history[-10:], indent=2)}
+{recent_prices}
 
 ## APY Data (if available)
-{json.dumps(apy_history[-5:], indent=2) if apy_history else "No APY data available"}
+{recent_apy}
 
 ## Analysis Request
 Provide a {forecast_days}-day price forecast for {product} with the following JSON structure:
@@ -141,7 +155,229 @@ Consider:
 Provide realistic, data-driven forecasts. Be conservative with confidence scores. Focus on probabilistic thinking rather than point predictions.
 """
 
-        return prompt
+
+def _parse_forecast_response(content: List[Any]) -> Dict[str, Any]:
+    """Extract forecast data from a Claude response (tool input, or JSON embedded in text)"""
+    for block in content:
+        if block.type == "tool_use":
+            return dict(block.input)
+
+    # Fallback: decode the first JSON object in the text, ignoring any trailing prose
+    response_text = "".join(block.text for block in content if block.type == "text")
+    json_start = response_text.find('{')
+    if json_start >= 0:
+        try:
+            forecast_data, _ = json.JSONDecoder().raw_decode(response_text, json_start)
+            if isinstance(forecast_data, dict):
+                return forecast_data
+        except json.JSONDecodeError:
+            pass
+    return {"raw_response": response_text}
+
+
+def _price_statistics(price_history: Dict[str, Any]) -> Dict[str, float]:
+    """Summary statistics used both in the prompt and as the cache feature vector"""
+    prices = [p["price"] for p in price_history["recent"]]
+    current_price = prices[-1]
+    avg_price = price_history["avg_price"]
+    min_price = price_history["min_price"]
+    max_price = price_history["max_price"]
+    volatility = (max_price - min_price) / avg_price * 100
+
+    # Recent trend
+    if price_history["count"] >= 7:
+        recent_avg = fmean(prices[-7:])
+        older_avg = fmean(prices[-14:-7]) if price_history["count"] >= 14 else avg_price
+        trend_pct = ((recent_avg - older_avg) / older_avg * 100) if older_avg else 0
+    else:
+        trend_pct = 0
+
+    return {
+        "current_price": current_price,
+        "avg_price": avg_price,
+        "min_price": min_price,
+        "max_price": max_price,
+        "volatility": volatility,
+        "trend_pct": trend_pct
+    }
+
+
+def _within_pct(value: float, reference: float, pct: float) -> bool:
+    """True if value is within pct% of reference (a zero reference only matches zero)"""
+    if reference == 0:
+        return value == 0
+    return abs(value - reference) / abs(reference) * 100 <= pct
+
+
+def _cache_forecast(bucket_key: str, cache_key: str, features: Tuple[float, ...], forecast: Dict[str, Any]):
+    """Store a forecast, evicting expired entries and the oldest beyond the bucket cap"""
+    now = datetime.now()
+    bucket = _forecast_cache.setdefault(bucket_key, OrderedDict())
+    bucket.pop(cache_key, None)  # Re-inserting moves the key to the newest end
+    bucket[cache_key] = (now, features, forecast)
+
+    while bucket:
+        oldest_key, (created_at, _, _) = next(iter(bucket.items()))
+        if len(bucket) <= FORECAST_CACHE_PER_BUCKET and now - created_at < FORECAST_CACHE_TTL:
+            break
+        del bucket[oldest_key]
+
+
+def _with_dates(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add a formatted date to each data point (used for the prompt excerpt only)"""
+    return [
+        {
+            "timestamp": point["timestamp"],
+            "date": datetime.fromtimestamp(point["timestamp"]).strftime("%Y-%m-%d"),
+            **{k: v for k, v in point.items() if k != "timestamp"}
+        }
+        for point in points
+    ]
+
+
+class ClaudeForecastingService:
+    """Service for AI-powered price forecasting using Claude"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            print("Warning: ANTHROPIC_API_KEY not set - forecasting will not work")
+        self.model = "claude-sonnet-4-5-20250929"
+
+        # One async client per service, reused across forecasts
+        if self.api_key and ANTHROPIC_AVAILABLE:
+            self.client = AsyncAnthropic(api_key=self.api_key)
+        else:
+            self.client = None
+
+    def _get_historical_data(self, db: Session, product: str, days: int = 90) -> Optional[Dict[str, Any]]:
+        """
+        Fetch historical price summary from database
+
+        Aggregates are computed in SQL; only the most recent points are loaded.
+
+        Returns:
+            Dict with count, min/max/avg price and the recent points (oldest first),
+            or None if there is no data in the window
+        """
+        cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
+        params = {"product": product, "cutoff": cutoff_timestamp}
+
+        count, min_price, max_price, avg_price = db.execute(_PRICE_SUMMARY_STMT, params).one()
+
+        if not count:
+            return None
+
+        recent = db.execute(_RECENT_PRICES_STMT, params).all()
+
+        # Dates are only formatted for the slice that ends up in the prompt
+        return {
+            "count": count,
+            "min_price": min_price,
+            "max_price": max_price,
+            "avg_price": avg_price,
+            "recent": [{"timestamp": p.timestamp, "price": p.price} for p in reversed(recent)]
+        }
+
+    def _get_apy_history(self, db: Session, product: str, days: int = 30) -> List[Dict[str, Any]]:
+        """Fetch historical APY data from database"""
+        cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
+
+        apys = db.execute(_APY_HISTORY_STMT, {"product": product, "cutoff": cutoff_timestamp}).all()
+
+        return [
+            {
+                "timestamp": a.timestamp,
+                "apy_total": a.apy_total,
+                "tvl_usd": a.tvl_usd
+            }
+            for a in apys
+        ]
+
+    def _build_analysis_prompt(
+        self,
+        product: str,
+        price_history: Dict[str, Any],
+        apy_history: List[Dict[str, Any]],
+        forecast_days: int,
+        stats: Optional[Dict[str, float]] = None
+    ) -> str:
+        """Build Claude prompt for price forecasting"""
+
+        # Calculate basic statistics (unless the caller already has them)
+        if stats is None:
+            stats = _price_statistics(price_history)
+
+        # Compact JSON: the model doesn't need indentation, and it saves prompt tokens
+        recent_prices = json.dumps(_with_dates(price_history["recent"][-10:]), separators=(",", ":"))
+        recent_apy = (
+            json.dumps(_with_dates(apy_history[-5:]), separators=(",", ":"))
+            if apy_history else "No APY data available"
+        )
+
+        return ANALYSIS_PROMPT_TEMPLATE.format(
+            product=product,
+            history_days=price_history["count"],
+            current_price=stats["current_price"],
+            avg_price=stats["avg_price"],
+            min_price=stats["min_price"],
+            max_price=stats["max_price"],
+            volatility=stats["volatility"],
+            trend_pct=stats["trend_pct"],
+            recent_prices=recent_prices,
+            recent_apy=recent_apy,
+            forecast_days=forecast_days
+        )
+
+    def _forecast_bucket_key(self, product: str, forecast_days: int) -> str:
+        """Forecasts are only reused within the same product, horizon and model"""
+        return f"{product}:{forecast_days}:{self.model}"
+
+    def _forecast_cache_key(self, product: str, forecast_days: int, price_history: Dict[str, Any]) -> str:
+        """Build a cache key from the forecast inputs (product, horizon, model, rounded price summary)"""
+        values = [
+            price_history["count"],
+            price_history["min_price"],
+            price_history["max_price"],
+            price_history["avg_price"],
+            *(p["price"] for p in price_history["recent"])
+        ]
+        values = [round(v, 2) for v in values]
+        digest = hashlib.blake2b(struct.pack(f"<{len(values)}d", *values), digest_size=16)
+        return f"{self._forecast_bucket_key(product, forecast_days)}:{digest.hexdigest()}"
+
+    def _get_cached_forecast(
+        self,
+        cache_key: str,
+        product: str,
+        forecast_days: int,
+        features: Tuple[float, ...]
+    ) -> Optional[Dict[str, Any]]:
+        """Return a recent forecast for identical or near-identical inputs"""
+        now = datetime.now()
+        bucket = _forecast_cache.get(self._forecast_bucket_key(product, forecast_days))
+        if not bucket:
+            return None
+
+        cached = bucket.get(cache_key)
+        if cached and now - cached[0] < FORECAST_CACHE_TTL:
+            return cached[2]
+
+        # Near match: same product/horizon/model and summary stats within tolerance
+        current, avg, volatility, trend = features
+        for created_at, cached_features, forecast in bucket.values():
+            if now - created_at >= FORECAST_CACHE_TTL:
+                continue
+            c_current, c_avg, c_volatility, c_trend = cached_features
+            if (
+                _within_pct(current, c_current, NEAR_MATCH_PRICE_PCT)
+                and _within_pct(avg, c_avg, NEAR_MATCH_PRICE_PCT)
+                and abs(volatility - c_volatility) <= NEAR_MATCH_STAT_PTS
+                and abs(trend - c_trend) <= NEAR_MATCH_STAT_PTS
+            ):
+                return forecast
+
+        return None
 
     async def generate_forecast(
         self,
@@ -184,17 +420,31 @@ Provide realistic, data-driven forecasts. Be conservative with confidence scores
                     "product": product
                 }
 
+            stats = _price_statistics(price_history)
+
+            # Reuse a recent forecast if the inputs haven't meaningfully changed
+            features = (stats["current_price"], stats["avg_price"], stats["volatility"], stats["trend_pct"])
+            cache_key = self._forecast_cache_key(product, forecast_days, price_history)
+            cached = self._get_cached_forecast(cache_key, product, forecast_days, features)
+            if cached:
+                return {**cached, "cached": True}
+
             # Build prompt
-            prompt = self._build_analysis_prompt(product, price_history, apy_history, forecast_days)
+            prompt = self._build_analysis_prompt(product, price_history, apy_history, forecast_days, stats)
 
-            # Call Claude API
-            from anthropic import Anthropic
-            client = Anthropic(api_key=self.api_key)
+            # Call Claude API (async, so the event loop isn't blocked)
+            if not self.client:
+                return {
+                    "error": "anthropic library not installed",
+                    "product": product
+                }
 
-            response = client.messages.create(
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=2000,
                 temperature=0.3,  # Lower temperature for more consistent predictions
+                tools=[FORECAST_TOOL],
+                tool_choice={"type": "tool", "name": FORECAST_TOOL["name"]},
                 messages=[{
                     "role": "user",
                     "content": prompt
@@ -202,29 +452,20 @@ Provide realistic, data-driven forecasts. Be conservative with confidence scores
             )
 
             # Parse response
-            response_text = response.content[0].text
-
-            # Try to extract JSON from response
-            try:
-                # Find JSON in the response
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    forecast_data = json.loads(response_text[json_start:json_end])
-                else:
-                    forecast_data = {"raw_response": response_text}
-            except json.JSONDecodeError:
-                forecast_data = {"raw_response": response_text}
+            forecast_data = _parse_forecast_response(response.content)
 
             # Add metadata
             forecast_data["product"] = product
             forecast_data["generated_at"] = datetime.now().isoformat()
             forecast_data["model"] = self.model
-            forecast_data["historical_days"] = len(price_history)
+            forecast_data["historical_days"] = price_history["count"]
 
             # Store forecast in database
             self._store_forecast(db, product, forecast_data)
 
+            if "raw_response" not in forecast_data:
+                _cache_forecast(self._forecast_bucket_key(product, forecast_days), cache_key, features, forecast_data)
+
             return forecast_data
 
         except Exception as e:
@@ -242,26 +483,28 @@ Provide realistic, data-driven forecasts. Be conservative with confidence scores
         try:
             # Extract forecast values for different time horizons
             forecasts = forecast_data.get("forecast", {})
+            now_ts = int(time.time())
+            reasoning = forecast_data.get("reasoning", "")
 
+            rows = []
             for period, data in forecasts.items():
                 if not isinstance(data, dict):
                     continue
 
                 # Calculate forecast timestamp
                 days = int(period.split('_')[0])
-                forecast_timestamp = int((datetime.now() + timedelta(days=days)).timestamp())
-
-                forecast_entry = PriceForecast(
-                    product=product,
-                    forecast_timestamp=forecast_timestamp,
-                    predicted_price=data.get("price", 0),
-                    confidence_score=data.get("confidence", 0),
-                    reasoning=forecast_data.get("reasoning", ""),
-                    model_version=self.model
-                )
-
-                db.add(forecast_entry)
 
+                rows.append({
+                    "product": product,
+                    "forecast_timestamp": now_ts + days * 86400,
+                    "predicted_price": data.get("price", 0),
+                    "confidence_score": data.get("confidence", 0),
+                    "reasoning": reasoning,
+                    "model_version": self.model
+                })
+
+            # All horizons in one batched insert
+            bulk_insert(db, PriceForecast, rows)
             db.commit()
             print(f"Stored forecast for {product}")
 
@@ -271,21 +514,23 @@ Provide realistic, data-driven forecasts. Be conservative with confidence scores
 
     async def generate_all_forecasts(self, forecast_days: int = 90) -> Dict[str, Any]:
         """Generate forecasts for all products"""
-        from defillama_client import ETHERFI_CONTRACTS
-
-        results = {}
-        db = SessionLocal()
+        products = list(ETHERFI_CONTRACTS.keys())
+        print(f"Generating forecasts for {', '.join(products)}...")
 
-        try:
-            for product in ETHERFI_CONTRACTS.keys():
-                print(f"Generating forecast for {product}...")
-                forecast = await self.generate_forecast(product, forecast_days, db)
-                results[product] = forecast
+        # Forecasts are independent; each task opens its own session since
+        # SQLAlchemy sessions are not safe for concurrent use
+        forecasts = await asyncio.gather(
+            *(self.generate_forecast(product, forecast_days) for product in products),
+            return_exceptions=True
+        )
 
-            return results
+        results = {}
+        for product, forecast in zip(products, forecasts):
+            if isinstance(forecast, Exception):
+                forecast = {"error": str(forecast), "product": product}
+            results[product] = forecast
 
-        finally:
-            db.close()
+        return results
 
 
 # Convenience functions
@@ -304,7 +549,6 @@ async def get_all_forecasts(forecast_days: int = 90) -> Dict[str, Any]:
 # CLI interface
 if __name__ == "__main__":
     import sys
-    import asyncio
 
     if len(sys.argv) > 1:
         product = sys.argv[1].upper()
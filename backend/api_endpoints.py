@@ -2,19 +2,44 @@
 Enhanced API endpoints for ether.fi data
 Integrates with DefiLlama, database storage, and AI forecasting
 """
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, bindparam, or_, select
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 
 from database import get_db, PriceHistory, APYHistory, PriceForecast
-from defillama_client import DefiLlamaClient, ETHERFI_CONTRACTS
+from defillama_client import DefiLlamaClient, ETHERFI_CONTRACTS, get_defillama_client
 from ai_forecasting import ClaudeForecastingService
 
 
 router = APIRouter(prefix="/api/v2", tags=["ether.fi data"])
 
+# Statements built once and reused with bound parameters
+_PRICE_HISTORY_STMT = select(PriceHistory).where(
+    PriceHistory.product == bindparam("product"),
+    PriceHistory.timestamp >= bindparam("cutoff")
+).order_by(PriceHistory.timestamp.asc())
+
+_APY_HISTORY_STMT = select(APYHistory).where(
+    APYHistory.product == bindparam("product"),
+    APYHistory.timestamp >= bindparam("cutoff")
+).order_by(APYHistory.timestamp.asc())
+
+# Prices recorded in the 24h-ago and 7d-ago windows for several products, oldest
+# first - used for the 24h/7d change
+_REFERENCE_PRICES_STMT = select(PriceHistory.product, PriceHistory.price, PriceHistory.timestamp).where(
+    PriceHistory.product.in_(bindparam("products", expanding=True)),
+    or_(
+        and_(PriceHistory.timestamp >= bindparam("day_start"), PriceHistory.timestamp < bindparam("day_end")),
+        and_(PriceHistory.timestamp >= bindparam("week_start"), PriceHistory.timestamp < bindparam("week_end"))
+    )
+).order_by(PriceHistory.timestamp.asc())
+
+SUMMARY_WINDOW_SECONDS = 3600  # Reference price is the first one in the hour 24h/7d ago
+
 
 # ========= Response Models =========
 
@@ -90,9 +115,8 @@ class ProductSummary(BaseModel):
 # ========= Endpoints =========
 
 @router.get("/prices/live", response_model=List[LivePrice])
-async def get_live_prices():
+async def get_live_prices(client: DefiLlamaClient = Depends(get_defillama_client)):
     """Get live prices for all ether.fi products from DefiLlama"""
-    client = DefiLlamaClient()
     prices = await client.get_current_prices()
 
     result = []
@@ -110,13 +134,12 @@ async def get_live_prices():
 
 
 @router.get("/prices/live/{product}", response_model=LivePrice)
-async def get_live_price(product: str):
+async def get_live_price(product: str, client: DefiLlamaClient = Depends(get_defillama_client)):
     """Get live price for a specific product"""
     product = product.upper()
     if product not in ETHERFI_CONTRACTS:
         raise HTTPException(status_code=404, detail=f"Product {product} not found")
 
-    client = DefiLlamaClient()
     prices = await client.get_current_prices()
 
     if product not in prices:
@@ -145,10 +168,9 @@ async def get_historical_prices(
 
     cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
 
-    prices = db.query(PriceHistory).filter(
-        PriceHistory.product == product,
-        PriceHistory.timestamp >= cutoff_timestamp
-    ).order_by(PriceHistory.timestamp.asc()).all()
+    prices = db.execute(
+        _PRICE_HISTORY_STMT, {"product": product, "cutoff": cutoff_timestamp}
+    ).scalars().all()
 
     if not prices:
         raise HTTPException(status_code=404, detail=f"No historical data found for {product}")
@@ -173,9 +195,8 @@ async def get_historical_prices(
 
 
 @router.get("/apy/live", response_model=List[LiveAPY])
-async def get_live_apy():
+async def get_live_apy(client: DefiLlamaClient = Depends(get_defillama_client)):
     """Get live APY data for all ether.fi products from DefiLlama"""
-    client = DefiLlamaClient()
     apy_data = await client.get_all_apys()
 
     result = []
@@ -193,13 +214,12 @@ async def get_live_apy():
 
 
 @router.get("/apy/live/{product}", response_model=LiveAPY)
-async def get_live_product_apy(product: str):
+async def get_live_product_apy(product: str, client: DefiLlamaClient = Depends(get_defillama_client)):
     """Get live APY for a specific product"""
     product = product.upper()
     if product not in ETHERFI_CONTRACTS:
         raise HTTPException(status_code=404, detail=f"Product {product} not found")
 
-    client = DefiLlamaClient()
     apy_data = await client.get_apy_for_product(product)
 
     if not apy_data:
@@ -228,10 +248,9 @@ async def get_apy_history(
 
     cutoff_timestamp = int((datetime.now() - timedelta(days=days)).timestamp())
 
-    apy_records = db.query(APYHistory).filter(
-        APYHistory.product == product,
-        APYHistory.timestamp >= cutoff_timestamp
-    ).order_by(APYHistory.timestamp.asc()).all()
+    apy_records = db.execute(
+        _APY_HISTORY_STMT, {"product": product, "cutoff": cutoff_timestamp}
+    ).scalars().all()
 
     if not apy_records:
         raise HTTPException(status_code=404, detail=f"No APY history found for {product}")
@@ -277,46 +296,42 @@ async def get_price_forecast(
     return forecast
 
 
-@router.get("/summary/{product}", response_model=ProductSummary)
-async def get_product_summary(product: str, db: Session = Depends(get_db)):
-    """Get comprehensive summary for a product"""
-    product = product.upper()
-    if product not in ETHERFI_CONTRACTS:
-        raise HTTPException(status_code=404, detail=f"Product {product} not found")
-
-    # Get current price from DefiLlama
-    client = DefiLlamaClient()
-    live_prices = await client.get_current_prices()
-    current_price = live_prices.get(product, {}).get("price")
-
-    # Get price changes from database
-    now = int(datetime.now().timestamp())
+def _reference_prices(
+    db: Session, products: List[str], now: int
+) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """First recorded price per product in the hour starting 24h and 7d ago, in one query"""
     day_ago = now - 86400
     week_ago = now - (86400 * 7)
+    rows = db.execute(_REFERENCE_PRICES_STMT, {
+        "products": products,
+        "day_start": day_ago, "day_end": day_ago + SUMMARY_WINDOW_SECONDS,
+        "week_start": week_ago, "week_end": week_ago + SUMMARY_WINDOW_SECONDS
+    })
 
-    price_24h_ago = db.query(PriceHistory).filter(
-        PriceHistory.product == product,
-        PriceHistory.timestamp >= day_ago,
-        PriceHistory.timestamp < day_ago + 3600
-    ).first()
+    prices_24h_ago = {}
+    prices_7d_ago = {}
+    for product, price, timestamp in rows:
+        window = prices_24h_ago if timestamp >= day_ago else prices_7d_ago
+        window.setdefault(product, price)
+    return prices_24h_ago, prices_7d_ago
 
-    price_7d_ago = db.query(PriceHistory).filter(
-        PriceHistory.product == product,
-        PriceHistory.timestamp >= week_ago,
-        PriceHistory.timestamp < week_ago + 3600
-    ).first()
 
+def _build_summary(
+    product: str,
+    current_price: Optional[float],
+    apy_data: Optional[Dict[str, Any]],
+    price_24h_ago: Optional[float],
+    price_7d_ago: Optional[float]
+) -> ProductSummary:
     price_change_24h = None
     price_change_7d = None
 
     if current_price and price_24h_ago:
-        price_change_24h = ((current_price - price_24h_ago.price) / price_24h_ago.price) * 100
+        price_change_24h = ((current_price - price_24h_ago) / price_24h_ago) * 100
 
     if current_price and price_7d_ago:
-        price_change_7d = ((current_price - price_7d_ago.price) / price_7d_ago.price) * 100
+        price_change_7d = ((current_price - price_7d_ago) / price_7d_ago) * 100
 
-    # Get current APY
-    apy_data = await client.get_apy_for_product(product)
     current_apy = apy_data.get("apy_total") if apy_data else None
     tvl_usd = apy_data.get("tvl_usd") if apy_data else None
 
@@ -331,14 +346,62 @@ async def get_product_summary(product: str, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/summary/{product}", response_model=ProductSummary)
+async def get_product_summary(
+    product: str,
+    db: Session = Depends(get_db),
+    client: DefiLlamaClient = Depends(get_defillama_client)
+):
+    """Get comprehensive summary for a product"""
+    product = product.upper()
+    if product not in ETHERFI_CONTRACTS:
+        raise HTTPException(status_code=404, detail=f"Product {product} not found")
+
+    # Get current price from DefiLlama
+    live_prices = await client.get_current_prices()
+    current_price = live_prices.get(product, {}).get("price")
+
+    # Get price changes from database
+    now = int(datetime.now().timestamp())
+    prices_24h_ago, prices_7d_ago = _reference_prices(db, [product], now)
+    price_24h_ago = prices_24h_ago.get(product)
+    price_7d_ago = prices_7d_ago.get(product)
+
+    # Get current APY
+    apy_data = await client.get_apy_for_product(product)
+
+    return _build_summary(product, current_price, apy_data, price_24h_ago, price_7d_ago)
+
+
 @router.get("/summary", response_model=List[ProductSummary])
-async def get_all_summaries(db: Session = Depends(get_db)):
+async def get_all_summaries(
+    db: Session = Depends(get_db),
+    client: DefiLlamaClient = Depends(get_defillama_client)
+):
     """Get summaries for all products"""
+    products = list(ETHERFI_CONTRACTS.keys())
+
+    # Live prices and APYs for every product in one request each
+    live_prices, all_apys = await asyncio.gather(
+        client.get_current_prices(),
+        client.get_all_apys()
+    )
+
+    # Reference prices for every product and both windows in one query
+    now = int(datetime.now().timestamp())
+    prices_24h_ago, prices_7d_ago = _reference_prices(db, products, now)
+
+    # One product with malformed data is skipped instead of failing the whole response
     summaries = []
-    for product in ETHERFI_CONTRACTS.keys():
+    for product in products:
         try:
-            summary = await get_product_summary(product, db)
-            summaries.append(summary)
+            summaries.append(_build_summary(
+                product,
+                live_prices.get(product, {}).get("price"),
+                all_apys.get(product),
+                prices_24h_ago.get(product),
+                prices_7d_ago.get(product)
+            ))
         except Exception as e:
             print(f"Error getting summary for {product}: {e}")
             continue
@@ -377,7 +440,10 @@ async def get_chart_data(
 
 
 @router.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(
+    db: Session = Depends(get_db),
+    client: DefiLlamaClient = Depends(get_defillama_client)
+):
     """Health check endpoint with database status"""
     try:
         # Check database
@@ -385,7 +451,6 @@ async def health_check(db: Session = Depends(get_db)):
         apy_count = db.query(APYHistory).count()
 
         # Check API
-        client = DefiLlamaClient()
         prices = await client.get_current_prices()
 
         return {
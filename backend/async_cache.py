@@ -0,0 +1,113 @@
+"""
+Helpers for async API fetchers
+- async_ttl_cache: repeated calls within the TTL reuse the last result; concurrent callers share one upstream fetch
+- call_upstream: bounds each upstream call with a timeout and a process-wide concurrency cap
+- ResponseModel / EMPTY: immutable response base and read-only default, safe to share through the caches
+- HTTP_TIMEOUT / HTTP_LIMITS / FETCH_ERRORS: shared client pool settings and the errors that mean "use the fallback"
+"""
+import asyncio
+import httpx
+import os
+import time
+import weakref
+from functools import wraps
+from types import MappingProxyType
+from typing import Any, Awaitable, Dict, Tuple
+from pydantic import BaseModel, ConfigDict
+
+
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5.0"))  # Seconds before a call falls back
+MAX_CONCURRENT_UPSTREAM = 8  # In-flight upstream calls across all analyzers
+
+# One connection pool shared by every API client while an analyzer is open
+HTTP_TIMEOUT = 30
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+
+# Network failures and malformed payloads fall back to defaults; anything else is a bug
+FETCH_ERRORS = (httpx.HTTPError, asyncio.TimeoutError, KeyError, ValueError, TypeError, AttributeError)
+
+# Shared read-only default for nested .get() lookups
+EMPTY = MappingProxyType({})
+
+# asyncio primitives are bound to one event loop, so keep a semaphore per loop
+_upstream_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+class ResponseModel(BaseModel):
+    """Immutable response model; instances may be shared through the fetch caches"""
+    model_config = ConfigDict(frozen=True)
+
+
+def async_ttl_cache(ttl: float = 30.0, method: bool = True):
+    """
+    Cache an async method's result for `ttl` seconds, shared across instances
+
+    The cache key is the call arguments excluding `self`, so analyzers built per
+    request still hit the same entries. Pass method=False to decorate a plain
+    module-level coroutine function. Exceptions are not cached.
+
+    `wrapper.refresh(...)` re-fetches and stores a value even if the entry is still
+    fresh, so a background task can keep entries warm. `wrapper.cache_size()`
+    reports the number of stored entries.
+    """
+    def decorator(func):
+        cache: Dict[Tuple, Tuple[float, Any]] = {}
+        # Locks are bound to an event loop, so keep them per loop
+        loop_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, asyncio.Lock]]" = weakref.WeakKeyDictionary()
+
+        async def load(args, kwargs, force):
+            key = (args[1:] if method else args, tuple(sorted(kwargs.items())))
+
+            entry = cache.get(key)
+            if not force and entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+
+            # Single-flight: callers that arrive mid-fetch wait for that fetch
+            locks = loop_locks.setdefault(asyncio.get_running_loop(), {})
+            lock = locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                entry = cache.get(key)
+                if not force and entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+
+                value = await func(*args, **kwargs)
+                cache[key] = (time.monotonic() + ttl, value)
+                return value
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await load(args, kwargs, force=False)
+
+        async def refresh(*args, **kwargs):
+            return await load(args, kwargs, force=True)
+
+        wrapper.refresh = refresh
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_size = cache.__len__
+        return wrapper
+
+    return decorator
+
+
+async def _with_slot(coro: Awaitable[Any]) -> Any:
+    loop = asyncio.get_running_loop()
+    slots = _upstream_slots.get(loop)
+    if slots is None:
+        slots = _upstream_slots[loop] = asyncio.Semaphore(MAX_CONCURRENT_UPSTREAM)
+
+    try:
+        async with slots:
+            return await coro
+    finally:
+        # No-op once awaited; avoids a "never awaited" warning if we timed out while queued
+        coro.close()
+
+
+async def call_upstream(coro: Awaitable[Any], timeout: float = UPSTREAM_TIMEOUT) -> Any:
+    """
+    Await an upstream API call, raising asyncio.TimeoutError after `timeout` seconds
+
+    The timeout includes time spent waiting for a concurrency slot, so a slow or
+    overloaded upstream degrades to the caller's fallback instead of stalling it.
+    """
+    return await asyncio.wait_for(_with_slot(coro), timeout=timeout)
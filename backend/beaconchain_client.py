@@ -3,23 +3,56 @@ Beaconcha.in API Client for Ethereum validator metrics
 Provides real operator uptime, attestation performance, and client diversity data
 API Docs: https://beaconcha.in/api/v1/docs
 """
+import asyncio
+import time
 import httpx
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import os
 
 
 BEACONCHAIN_API = "https://beaconcha.in/api/v1"
 BEACONCHAIN_API_KEY = os.getenv("BEACONCHAIN_API_KEY", "")  # Optional, increases rate limits
+MAX_CONCURRENT_REQUESTS = 8  # Stay under Beaconcha.in rate limits when fanning out
+VALIDATOR_CACHE_TTL = 300  # Seconds to reuse the ether.fi validator list
+
+# Connection pool sizing for high fan-out (e.g. many attestation requests)
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=MAX_CONCURRENT_REQUESTS, keepalive_expiry=30)
+
+
+def _sum_attestations(validator_perfs: List[Any]) -> Tuple[int, int]:
+    """Sum total and missed attestations across per-validator performance records"""
+    records = [perf for perf in validator_perfs if isinstance(perf, dict)]
+    total = sum(perf.get("attestations", 0) for perf in records)
+    missed = sum(perf.get("missed_attestations", 0) for perf in records)
+    return total, missed
 
 
 class BeaconchainClient:
     """Client for fetching Ethereum validator metrics from Beaconcha.in"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key or BEACONCHAIN_API_KEY
         self.base_url = BEACONCHAIN_API
         self.timeout = 30
+        self.headers = {"apikey": self.api_key} if self.api_key else {}
+        self.http_client = http_client
+        self._client: Optional[httpx.AsyncClient] = None
+        self._validator_cache: Optional[Tuple[float, List[int]]] = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Get the injected HTTP client, or this client's own pool (created on first use)"""
+        if self.http_client is not None:
+            return self.http_client
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, headers=self.headers, limits=HTTP_LIMITS)
+        return self._client
+
+    async def aclose(self):
+        """Close this client's own HTTP pool (an injected client is left to its owner)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def get_validator_performance(self, validator_indices: List[int]) -> Dict[str, Any]:
         """
@@ -35,21 +68,17 @@ class BeaconchainClient:
         indices_str = ",".join(str(idx) for idx in validator_indices)
         url = f"{self.base_url}/validator/{indices_str}/performance"
 
-        headers = {}
-        if self.api_key:
-            headers["apikey"] = self.api_key
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(url, headers=headers)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                print(f"HTTP error fetching validator performance: {e}")
-                return {}
-            except Exception as e:
-                print(f"Error fetching validator performance: {e}")
-                return {}
+        client = await self._get_client()
+        try:
+            response = await client.get(url, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"HTTP error fetching validator performance: {e}")
+            return {}
+        except Exception as e:
+            print(f"Error fetching validator performance: {e}")
+            return {}
 
     async def get_validator_attestations(self, validator_index: int, limit: int = 100) -> Dict[str, Any]:
         """
@@ -65,18 +94,33 @@ class BeaconchainClient:
         url = f"{self.base_url}/validator/{validator_index}/attestations"
         params = {"limit": min(limit, 100)}
 
-        headers = {}
-        if self.api_key:
-            headers["apikey"] = self.api_key
+        client = await self._get_client()
+        try:
+            response = await client.get(url, params=params, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching attestations: {e}")
+            return {}
+
+    async def get_many_attestations(self, validator_indices: List[int], limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get recent attestation history for several validators concurrently
+
+        Args:
+            validator_indices: List of validator indices
+            limit: Number of recent attestations to fetch per validator (max 100)
+
+        Returns:
+            List of attestation data, in the same order as validator_indices
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                print(f"Error fetching attestations: {e}")
-                return {}
+        async def _fetch(validator_index: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_validator_attestations(validator_index, limit)
+
+        return await asyncio.gather(*(_fetch(idx) for idx in validator_indices))
 
     async def get_etherfi_validators(self) -> List[int]:
         """
@@ -87,13 +131,20 @@ class BeaconchainClient:
         Returns:
             List of validator indices
         """
+        if self._validator_cache:
+            fetched_at, indices = self._validator_cache
+            if time.monotonic() - fetched_at < VALIDATOR_CACHE_TTL:
+                return indices
+
         # For demo purposes, return a sample set
         # In production, query ether.fi contracts or their API
         # Example: Query NodeManager contract for registered validators
-        return [
+        indices = [
             100000, 100001, 100002, 100003, 100004,  # Sample indices
             100005, 100006, 100007, 100008, 100009
         ]
+        self._validator_cache = (time.monotonic(), indices)
+        return indices
 
     async def calculate_uptime_metrics(
         self,
@@ -136,13 +187,7 @@ class BeaconchainClient:
             }
 
         # Parse performance data
-        total_attestations = 0
-        missed_attestations = 0
-
-        for validator_perf in performance_data.get("data", []):
-            if isinstance(validator_perf, dict):
-                total_attestations += validator_perf.get("attestations", 0)
-                missed_attestations += validator_perf.get("missed_attestations", 0)
+        total_attestations, missed_attestations = _sum_attestations(performance_data.get("data", []))
 
         # Calculate uptime percentage
         if total_attestations > 0:
@@ -223,17 +268,26 @@ class BeaconchainClient:
 async def get_etherfi_uptime(days: int = 7) -> Dict[str, Any]:
     """Get uptime metrics for ether.fi validators"""
     client = BeaconchainClient()
-    return await client.calculate_uptime_metrics(days=days)
+    try:
+        return await client.calculate_uptime_metrics(days=days)
+    finally:
+        await client.aclose()
 
 
 async def get_etherfi_performance() -> Dict[str, Any]:
     """Get comprehensive performance metrics for ether.fi"""
     client = BeaconchainClient()
 
-    # Get all metrics
-    uptime = await client.calculate_uptime_metrics()
-    client_diversity = await client.get_client_diversity()
-    dvt_status = await client.check_dvt_protection()
+    # Look up validators once, then get all metrics concurrently over one shared connection pool
+    try:
+        indices = await client.get_etherfi_validators()
+        uptime, client_diversity, dvt_status = await asyncio.gather(
+            client.calculate_uptime_metrics(indices),
+            client.get_client_diversity(indices),
+            client.check_dvt_protection(indices)
+        )
+    finally:
+        await client.aclose()
 
     return {
         "uptime": uptime,
@@ -273,9 +327,9 @@ async def test_beaconchain_client():
     print(f"  Provider: {dvt.get('dvt_provider')}")
     print(f"  Protection: {dvt.get('protection_pct')}%")
 
+    await client.aclose()
     print("\n" + "=" * 60)
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_beaconchain_client())
@@ -3,14 +3,20 @@ Background data fetcher service - runs periodically to collect and store data
 Can be run as a standalone service or integrated with FastAPI
 """
 import asyncio
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
-from database import SessionLocal, PriceHistory, APYHistory, MarketMetrics, init_db
+from database import SessionLocal, init_db, maintain_partitions, bulk_upsert_prices, bulk_upsert_apy
 from defillama_client import DefiLlamaClient, ETHERFI_CONTRACTS
 import time
 
 
+def _format_ts(timestamp: int) -> str:
+    """Format a Unix timestamp for log lines"""
+    return datetime.fromtimestamp(timestamp).isoformat(sep=" ")
+
+
 class DataFetcherService:
     """Service to fetch and store ether.fi data periodically"""
 
@@ -18,74 +24,84 @@ class DataFetcherService:
         self.interval_minutes = interval_minutes
         self.client = DefiLlamaClient()
         self.running = False
+        self.partitions_maintained_on: Optional[date] = None
 
-    async def fetch_and_store_prices(self, db: Session):
+    async def fetch_and_store_prices(self, db: Session, timestamp: Optional[int] = None):
         """Fetch current prices and store in database"""
-        print(f"[{datetime.now()}] Fetching current prices...")
+        timestamp = timestamp or int(time.time())
+        print(f"[{_format_ts(timestamp)}] Fetching current prices...")
 
         try:
             prices = await self.client.get_current_prices()
-            timestamp = int(time.time())
 
+            rows = []
             for product, data in prices.items():
                 if data.get("price") is None:
                     print(f"  Warning: No price data for {product}")
                     continue
 
-                # Create price history entry
-                price_entry = PriceHistory(
-                    product=product,
-                    price=data["price"],
-                    timestamp=data.get("timestamp", timestamp),
-                    source="defillama",
-                    confidence=data.get("confidence")
-                )
-
-                # Add to database (will skip if duplicate due to unique constraint)
-                try:
-                    db.add(price_entry)
-                    db.commit()
-                    print(f"  ✓ Stored {product} price: ${data['price']:.2f}")
-                except Exception as e:
-                    db.rollback()
-                    if "UNIQUE constraint failed" in str(e) or "duplicate key" in str(e):
-                        print(f"  ⚠ Duplicate entry for {product} at timestamp {timestamp}")
-                    else:
-                        print(f"  ✗ Error storing {product} price: {e}")
+                rows.append({
+                    "product": product,
+                    "price": data["price"],
+                    "timestamp": data.get("timestamp", timestamp),
+                    "source": "defillama",
+                    "confidence": data.get("confidence")
+                })
+
+            # Single transaction; duplicates are skipped by the unique constraint
+            try:
+                inserted = set(bulk_upsert_prices(db, rows))
+                db.commit()
+                for row in rows:
+                    if row["product"] in inserted:
+                        print(f"  ✓ {row['product']} price: ${row['price']:.2f}")
+                if len(inserted) < len(rows):
+                    print(f"  ⚠ Skipped {len(rows) - len(inserted)} duplicate price entries")
+            except IntegrityError as e:
+                db.rollback()
+                print(f"  ✗ Invalid price rows rejected by database: {e.orig}")
+            except SQLAlchemyError as e:
+                db.rollback()
+                print(f"  ✗ Error storing prices: {e}")
 
         except Exception as e:
             print(f"Error fetching prices: {e}")
 
-    async def fetch_and_store_apy(self, db: Session):
+    async def fetch_and_store_apy(self, db: Session, timestamp: Optional[int] = None):
         """Fetch APY data and store in database"""
-        print(f"[{datetime.now()}] Fetching APY data...")
+        timestamp = timestamp or int(time.time())
+        print(f"[{_format_ts(timestamp)}] Fetching APY data...")
 
         try:
             apy_data = await self.client.get_all_apys()
-            timestamp = int(time.time())
-
-            for product, data in apy_data.items():
-                # Create APY history entry
-                apy_entry = APYHistory(
-                    product=product,
-                    apy_base=data.get("apy_base"),
-                    apy_reward=data.get("apy_reward"),
-                    apy_total=data.get("apy_total"),
-                    tvl_usd=data.get("tvl_usd"),
-                    timestamp=timestamp
-                )
-
-                # Add to database
-                try:
-                    db.add(apy_entry)
-                    db.commit()
-                    print(f"  ✓ Stored {product} APY: {data.get('apy_total', 0):.2f}% (TVL: ${data.get('tvl_usd', 0):,.0f})")
-                except Exception as e:
-                    db.rollback()
-                    if "UNIQUE constraint failed" in str(e) or "duplicate key" in str(e):
-                        print(f"  ⚠ Duplicate entry for {product} at timestamp {timestamp}")
-                    else:
-                        print(f"  ✗ Error storing {product} APY: {e}")
+
+            rows = [
+                {
+                    "product": product,
+                    "apy_base": data.get("apy_base"),
+                    "apy_reward": data.get("apy_reward"),
+                    "apy_total": data.get("apy_total"),
+                    "tvl_usd": data.get("tvl_usd"),
+                    "timestamp": timestamp
+                }
+                for product, data in apy_data.items()
+            ]
+
+            # Single transaction; duplicates are skipped by the unique constraint
+            try:
+                inserted = set(bulk_upsert_apy(db, rows))
+                db.commit()
+                for product, data in apy_data.items():
+                    if product in inserted:
+                        print(f"  ✓ {product} APY: {data.get('apy_total', 0):.2f}% (TVL: ${data.get('tvl_usd', 0):,.0f})")
+                if len(inserted) < len(rows):
+                    print(f"  ⚠ Skipped {len(rows) - len(inserted)} duplicate APY entries at timestamp {timestamp}")
+            except IntegrityError as e:
+                db.rollback()
+                print(f"  ✗ Invalid APY rows rejected by database: {e.orig}")
+            except SQLAlchemyError as e:
+                db.rollback()
+                print(f"  ✗ Error storing APY data: {e}")
 
         except Exception as e:
             print(f"Error fetching APY data: {e}")
@@ -94,48 +110,64 @@ class DataFetcherService:
         """Backfill historical price data for all products"""
         print(f"[{datetime.now()}] Starting backfill for last {days_back} days...")
 
-        for product in ETHERFI_CONTRACTS.keys():
-            print(f"\nBackfilling {product}...")
+        # Fetch all products concurrently; only the DB writes are serialized
+        products = list(ETHERFI_CONTRACTS.keys())
+        histories = await asyncio.gather(
+            *(self.client.get_historical_prices(product, days_back=days_back) for product in products),
+            return_exceptions=True
+        )
 
+        # One batched insert and commit per product, so a bad row only loses its own product
+        for product, history in zip(products, histories):
+            if isinstance(history, Exception):
+                print(f"  ✗ Error backfilling {product}: {history}")
+                continue
+
+            # Duplicates are skipped silently
             try:
-                history = await self.client.get_historical_prices(product, days_back=days_back)
-
-                stored_count = 0
-                for point in history:
-                    if point.get("price") is None:
-                        continue
-
-                    price_entry = PriceHistory(
-                        product=product,
-                        price=point["price"],
-                        timestamp=point["timestamp"],
-                        source="defillama",
-                        confidence=point.get("confidence")
-                    )
-
-                    try:
-                        db.add(price_entry)
-                        db.commit()
-                        stored_count += 1
-                    except Exception as e:
-                        db.rollback()
-                        # Skip duplicates silently during backfill
-                        if "UNIQUE constraint failed" not in str(e) and "duplicate key" not in str(e):
-                            print(f"  Error storing data point: {e}")
-
-                print(f"  ✓ Backfilled {stored_count} data points for {product}")
-
-            except Exception as e:
-                print(f"  ✗ Error backfilling {product}: {e}")
+                rows = [
+                    {
+                        "product": product,
+                        "price": point["price"],
+                        "timestamp": point["timestamp"],
+                        "source": "defillama",
+                        "confidence": point.get("confidence")
+                    }
+                    for point in history
+                    if point.get("price") is not None
+                ]
+                stored = len(bulk_upsert_prices(db, rows))
+                db.commit()
+                print(f"  ✓ Backfilled {stored} data points for {product}")
+            except IntegrityError as e:
+                db.rollback()
+                print(f"  ✗ Invalid {product} data points rejected by database: {e.orig}")
+            except SQLAlchemyError as e:
+                db.rollback()
+                print(f"  ✗ Error storing {product} data points: {e}")
+            except (KeyError, TypeError) as e:
+                print(f"  ✗ Malformed {product} history from DefiLlama: {e!r}")
 
         print(f"\n[{datetime.now()}] Backfill complete!")
 
     async def run_fetch_cycle(self):
         """Run one complete fetch cycle"""
+        # One clock read per cycle, shared by both fetches
+        timestamp = int(time.time())
+
+        # Partition rollover/retention only needs to run once a day
+        today = date.today()
+        if self.partitions_maintained_on != today:
+            try:
+                maintain_partitions()
+                self.partitions_maintained_on = today
+            except SQLAlchemyError as e:
+                print(f"Error maintaining partitions: {e}")
+
         db = SessionLocal()
         try:
-            await self.fetch_and_store_prices(db)
-            await self.fetch_and_store_apy(db)
+            await self.fetch_and_store_prices(db, timestamp)
+            await self.fetch_and_store_apy(db, timestamp)
         finally:
             db.close()
 
@@ -145,14 +177,24 @@ class DataFetcherService:
         print(f"Data fetcher started - running every {self.interval_minutes} minutes")
         print("Press Ctrl+C to stop\n")
 
-        # Run initial fetch
-        await self.run_fetch_cycle()
+        interval = self.interval_minutes * 60
+        next_tick = time.monotonic()
 
-        # Continue periodic fetches
+        # Fetch on a fixed schedule so cycle runtime doesn't push later runs back
         while self.running:
-            await asyncio.sleep(self.interval_minutes * 60)
             await self.run_fetch_cycle()
 
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Cycle overran the interval; skip missed ticks instead of bursting
+                missed = int(-delay // interval) + 1
+                print(f"⚠ Fetch cycle overran by {-delay:.0f}s, skipping {missed} tick(s)")
+                next_tick += missed * interval
+                delay = next_tick - time.monotonic()
+
+            await asyncio.sleep(delay)
+
     def stop(self):
         """Stop the data fetcher"""
         self.running = False
@@ -2,88 +2,386 @@
 Database models and initialization for ether.fi data storage
 Supports both SQLite (development) and PostgreSQL (production)
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, BigInteger, DateTime, Text, UniqueConstraint
+from sqlalchemy import create_engine, event, func, insert, inspect, text, Column, Integer, SmallInteger, String, Float, BigInteger, DateTime, Text, JSON, UniqueConstraint, Index, ForeignKey, TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 import os
+import re
 
 # Database URL - defaults to SQLite for development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./etherfi_data.db")
+IS_POSTGRES = DATABASE_URL.startswith("postgres")
+
+# Time-series tables are range-partitioned by month on PostgreSQL (plain tables on SQLite)
+PARTITIONED_TABLES = ("price_history", "apy_history", "market_metrics")
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "18"))
+PARTITION_PREMAKE_MONTHS = 3  # Future months created ahead of incoming data
+_PARTITION_ARGS = {"postgresql_partition_by": "RANGE (timestamp)"}
+
+# Set to "0" when the schema is provisioned separately, to skip init_db() on app startup
+CREATE_SCHEMA_ON_START = os.getenv("CREATE_SCHEMA_ON_START", "1") == "1"
+
+# Connection pool sizing (PostgreSQL) - tunable without a code change
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Compiled SQL cache entries kept per engine (SQLAlchemy default is 500)
+DB_QUERY_CACHE_SIZE = 1200
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+if "sqlite" in DATABASE_URL:
+    # SQLite connections are cheap to open; don't hold file handles in a pool
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+        query_cache_size=DB_QUERY_CACHE_SIZE
+    )
+else:
+    # LIFO reuses a small hot set of connections and lets the rest idle out
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        pool_use_lifo=True,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        # Multi-row VALUES for inserts, execute_batch for other executemany statements
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000
+    )
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL + relaxed fsync: much cheaper commits, still safe for this telemetry data"""
+        # Let SQLAlchemy emit BEGIN itself (below) instead of pysqlite's implicit transactions
+        dbapi_connection.isolation_level = None
+        dbapi_connection.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA mmap_size=268435456;"  # 256 MB
+            "PRAGMA cache_size=-65536;"  # 64 MB
+        )
+
+    @event.listens_for(engine, "begin")
+    def _begin_sqlite_transaction(conn):
+        """Start transactions explicitly, only when SQLAlchemy actually begins one"""
+        conn.exec_driver_sql("BEGIN")
+
+
+def _brin_timestamp_index(name: str) -> Index:
+    """
+    Index on an append-only timestamp column: BRIN on PostgreSQL (min/max per
+    block range, kilobytes instead of a full B-tree), regular index on SQLite
+    """
+    return Index(name, 'timestamp', postgresql_using='brin', postgresql_with={'pages_per_range': 32})
+
+
+# Dimension ids for low-cardinality columns - append only, never renumber
+PRODUCT_IDS = {"eETH": 1, "weETH": 2, "ETHFI": 3, "eBTC": 4, "LiquidUSD": 5}
+SOURCE_IDS = {"defillama": 1, "coingecko": 2}
+
+# Tables whose varchar product/source columns became dimension ids (see migrate_legacy_schema)
+LEGACY_DIMENSION_TABLES = ("price_history", "apy_history")
+
+
+class ProductCode(TypeDecorator):
+    """Stores a product symbol as its SMALLINT id; callers keep using 'eETH' etc."""
+    impl = SmallInteger
+    cache_ok = True
+    _names = {v: k for k, v in PRODUCT_IDS.items()}
+
+    def process_bind_param(self, value, dialect):
+        # Unknown symbols bind as NULL: they match nothing and fail NOT NULL on insert
+        return None if value is None else PRODUCT_IDS.get(value)
+
+    def process_result_value(self, value, dialect):
+        # Ids missing from PRODUCT_IDS (e.g. a row added by a newer deploy) read back as None
+        return None if value is None else self._names.get(value)
+
+
+class SourceCode(TypeDecorator):
+    """Stores a data source name as its SMALLINT id; callers keep using 'defillama' etc."""
+    impl = SmallInteger
+    cache_ok = True
+    _names = {v: k for k, v in SOURCE_IDS.items()}
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else SOURCE_IDS.get(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._names.get(value)
+
+
+# 4-byte floats for prices/rates (~7 significant digits); TVL-sized values stay double
+_Real = Float(precision=24)
+
+# High-volume history ids: BIGINT, but plain INTEGER on SQLite so it stays the rowid alias
+_HistoryId = BigInteger().with_variant(Integer, "sqlite")
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # ========= Models =========
 
+class ProductDim(Base):
+    """Product dimension referenced by the time-series tables"""
+    __tablename__ = "product_dim"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    symbol = Column(String(10), nullable=False, unique=True)
+
+
+class SourceDim(Base):
+    """Data source dimension referenced by price history"""
+    __tablename__ = "source_dim"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String(50), nullable=False, unique=True)
+
+
 class PriceHistory(Base):
     """Historical price data for ether.fi products"""
     __tablename__ = "price_history"
 
-    id = Column(Integer, primary_key=True, index=True)
-    product = Column(String(10), nullable=False, index=True)  # 'eETH', 'weETH', 'ETHFI', 'eBTC'
-    price = Column(Float, nullable=False)
-    timestamp = Column(BigInteger, nullable=False, index=True)  # Unix timestamp
-    source = Column(String(50), nullable=False)  # 'defillama', 'coingecko', etc.
-    confidence = Column(Float, nullable=True)  # Confidence score from API
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id = Column(_HistoryId, primary_key=True, autoincrement=True)
+    product = Column("product_id", ProductCode, ForeignKey("product_dim.id"), nullable=False)  # 'eETH', 'weETH', 'ETHFI', 'eBTC'
+    price = Column(_Real, nullable=False)
+    # Partition key must be part of the primary key on PostgreSQL
+    timestamp = Column(BigInteger, nullable=False, primary_key=IS_POSTGRES)  # Unix timestamp
+    source = Column("source_id", SourceCode, ForeignKey("source_dim.id"), nullable=False)  # 'defillama', 'coingecko', etc.
+    confidence = Column(_Real, nullable=True)  # Confidence score from API
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    __table_args__ = (UniqueConstraint('product', 'timestamp', 'source', name='_product_timestamp_source_uc'),)
+    # Per-product time-range scans (forecasts, history endpoints) use the composite index;
+    # on PostgreSQL it also carries price so latest-price/summary reads are index-only
+    __table_args__ = (
+        UniqueConstraint('product_id', 'timestamp', 'source_id', name='_product_timestamp_source_uc'),
+        Index('ix_pricehistory_product_ts', 'product_id', 'timestamp', postgresql_include=['price']),
+        _brin_timestamp_index('ix_pricehistory_ts'),
+        _PARTITION_ARGS,
+    )
 
 
 class APYHistory(Base):
     """Historical APY data for ether.fi products"""
     __tablename__ = "apy_history"
 
-    id = Column(Integer, primary_key=True, index=True)
-    product = Column(String(10), nullable=False, index=True)
-    apy_base = Column(Float, nullable=True)  # Base APY from staking
-    apy_reward = Column(Float, nullable=True)  # Reward APY
-    apy_total = Column(Float, nullable=True)  # Total APY
+    id = Column(_HistoryId, primary_key=True, autoincrement=True)
+    product = Column("product_id", ProductCode, ForeignKey("product_dim.id"), nullable=False)
+    apy_base = Column(_Real, nullable=True)  # Base APY from staking
+    apy_reward = Column(_Real, nullable=True)  # Reward APY
+    apy_total = Column(_Real, nullable=True)  # Total APY
     tvl_usd = Column(Float, nullable=True)  # Total Value Locked in USD
-    timestamp = Column(BigInteger, nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(BigInteger, nullable=False, primary_key=IS_POSTGRES)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    __table_args__ = (UniqueConstraint('product', 'timestamp', name='_product_timestamp_uc'),)
+    # The unique constraint's (product, timestamp) index serves per-product range scans;
+    # PostgreSQL additionally gets a covering copy so APY/TVL reads skip the heap
+    __table_args__ = (
+        UniqueConstraint('product_id', 'timestamp', name='_product_timestamp_uc'),
+        _brin_timestamp_index('ix_apyhistory_ts'),
+        *([Index('ix_apyhistory_product_ts', 'product_id', 'timestamp',
+                 postgresql_include=['apy_total', 'tvl_usd'])] if IS_POSTGRES else []),
+        _PARTITION_ARGS,
+    )
 
 
 class PriceForecast(Base):
     """AI-generated price forecasts"""
     __tablename__ = "price_forecasts"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     product = Column(String(10), nullable=False, index=True)
     forecast_timestamp = Column(BigInteger, nullable=False)  # When prediction is for
-    predicted_price = Column(Float, nullable=False)
-    confidence_score = Column(Float, nullable=True)  # 0.0 to 1.0
+    predicted_price = Column(_Real, nullable=False)
+    confidence_score = Column(_Real, nullable=True)  # 0.0 to 1.0
     reasoning = Column(Text, nullable=True)  # AI reasoning
     model_version = Column(String(50), nullable=True)  # Claude model used
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # When prediction was made
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # When prediction was made
 
 
 class MarketMetrics(Base):
     """General market metrics and metadata"""
     __tablename__ = "market_metrics"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     metric_name = Column(String(50), nullable=False, index=True)  # 'eth_price', 'total_tvl', etc.
     value = Column(Float, nullable=False)
-    extra_data = Column(Text, nullable=True)  # JSON string for additional data (renamed from 'metadata')
-    timestamp = Column(BigInteger, nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    extra_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # Additional data as a dict (renamed from 'metadata')
+    timestamp = Column(BigInteger, nullable=False, primary_key=IS_POSTGRES)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        _brin_timestamp_index('ix_marketmetrics_ts'),
+        # GIN lets PostgreSQL filter on extra_data keys (e.g. extra_data @> '{"chain": "base"}')
+        *([Index('ix_marketmetrics_extra_gin', 'extra_data', postgresql_using='gin')] if IS_POSTGRES else []),
+        _PARTITION_ARGS,
+    )
 
 
 # ========= Database Functions =========
 
+def _add_months(month_start: datetime, months: int) -> datetime:
+    """Shift a first-of-month datetime by a number of months"""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def maintain_partitions(conn=None):
+    """
+    Create monthly partitions (retention window plus a few months ahead) and
+    drop partitions older than PARTITION_RETENTION_MONTHS. No-op on SQLite.
+
+    Dropping a whole month replaces row-by-row DELETEs, so retention leaves no bloat.
+    Rows outside the covered range land in each table's DEFAULT partition.
+    Runs in its own transaction unless a connection is passed in.
+    """
+    if not IS_POSTGRES:
+        return
+
+    now = datetime.now(timezone.utc)
+    current_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    oldest_kept = f"{_add_months(current_month, -PARTITION_RETENTION_MONTHS):%Y%m}"
+
+    with engine.begin() if conn is None else nullcontext(conn) as conn:
+        for table in PARTITIONED_TABLES:
+            # relkind 'p' = partitioned; tables created before partitioning are plain ('r')
+            relkind = conn.execute(
+                text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+            ).scalar()
+            if relkind != "p":
+                print(f"⚠ {table} is not a partitioned table, skipping partition maintenance "
+                      f"(recreate the table to enable partitioning)")
+                continue
+
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+            for offset in range(-PARTITION_RETENTION_MONTHS, PARTITION_PREMAKE_MONTHS + 1):
+                start = _add_months(current_month, offset)
+                end = _add_months(start, 1)
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ({int(start.timestamp())}) TO ({int(end.timestamp())})"
+                ))
+
+            partitions = conn.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "WHERE parent.relname = :table"
+            ), {"table": table}).scalars().all()
+
+            for partition in partitions:
+                match = re.fullmatch(rf"{table}_(\d{{6}})", partition)
+                if match and match.group(1) < oldest_kept:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+                    print(f"Dropped expired partition {partition}")
+
+
+def seed_dimensions(conn=None):
+    """Insert the product/source dimension rows (existing rows are left alone)"""
+    with engine.begin() if conn is None else nullcontext(conn) as conn:
+        bulk_insert_ignore_duplicates(
+            conn, ProductDim, [{"id": id_, "symbol": symbol} for symbol, id_ in PRODUCT_IDS.items()]
+        )
+        bulk_insert_ignore_duplicates(
+            conn, SourceDim, [{"id": id_, "name": name} for name, id_ in SOURCE_IDS.items()]
+        )
+
+
+def _legacy_tables(conn) -> List[str]:
+    """History tables still using the old varchar product/source columns"""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    return [
+        name for name in LEGACY_DIMENSION_TABLES
+        if name in existing and "product_id" not in {col["name"] for col in inspector.get_columns(name)}
+    ]
+
+
+def _code_case(column: str, ids: Dict[str, int]) -> str:
+    """SQL CASE mapping a legacy varchar column to its dimension id (NULL if unknown)"""
+    whens = " ".join(f"WHEN '{name}' THEN {id_}" for name, id_ in ids.items())
+    return f"CASE {column} {whens} END"
+
+
+def migrate_legacy_schema():
+    """
+    Convert price_history/apy_history from the old varchar product/source
+    columns to the SMALLINT dimension ids, keeping every row.
+
+    Runs in a single transaction: each table is copied aside, recreated from
+    the current model (partitioned on PostgreSQL) and refilled. A row with an
+    unknown product/source fails NOT NULL and rolls the whole migration back.
+    """
+    with engine.begin() as conn:
+        legacy = _legacy_tables(conn)
+        if not legacy:
+            print("Schema already uses dimension ids, nothing to migrate")
+            return
+
+        Base.metadata.create_all(bind=conn, tables=[ProductDim.__table__, SourceDim.__table__])
+        seed_dimensions(conn)
+
+        # CREATE TABLE AS copies rows only, so the old indexes/constraints go away with the DROP
+        for name in legacy:
+            conn.execute(text(f"CREATE TABLE {name}_legacy AS SELECT * FROM {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+            Base.metadata.tables[name].create(bind=conn)
+        maintain_partitions(conn)
+
+        mapped = {
+            "product_id": _code_case("product", PRODUCT_IDS),
+            "source_id": _code_case("source", SOURCE_IDS),
+            "created_at": "COALESCE(created_at, CURRENT_TIMESTAMP)",  # nullable in the old layout
+        }
+        for name in legacy:
+            columns = [col.name for col in Base.metadata.tables[name].columns]
+            selects = [mapped.get(col, col) for col in columns]
+            copied = conn.execute(text(
+                f"INSERT INTO {name} ({', '.join(columns)}) "
+                f"SELECT {', '.join(selects)} FROM {name}_legacy"
+            )).rowcount
+            conn.execute(text(f"DROP TABLE {name}_legacy"))
+            if IS_POSTGRES:
+                # Explicit ids were copied, so move the id sequence past them
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                    f"FROM {name}"
+                ))
+            print(f"Migrated {copied} rows in {name}")
+
+
 def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    legacy = _legacy_tables(engine)
+    if legacy:
+        raise RuntimeError(
+            f"{', '.join(legacy)} still use the old varchar product/source columns. "
+            "Back up the database, then run `python database.py migrate` to convert them."
+        )
+
+    # One catalog query, then create only what's missing (create_all probes table by table)
+    existing = set(inspect(engine).get_table_names())
+    missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing, checkfirst=False)
+    seed_dimensions()
+    maintain_partitions()
     print(f"Database initialized at {DATABASE_URL}")
 
 
@@ -96,14 +394,88 @@ def get_db():
         db.close()
 
 
+def bulk_insert(db: Session, model, rows: List[Dict[str, Any]]):
+    """
+    Insert many rows with one Core executemany instead of one ORM INSERT per
+    object; SQLAlchemy batches them into multi-row statements (insertmanyvalues).
+    Does not commit.
+    """
+    if rows:
+        db.execute(insert(model), rows)
+
+
+def bulk_insert_ignore_duplicates(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    conflict_columns: Optional[List[str]] = None,
+    returning=None
+) -> List[Any]:
+    """
+    Insert many rows in one executemany, letting the database skip rows that
+    hit a unique constraint (ON CONFLICT DO NOTHING) instead of raising.
+    Works with a Session or a Connection. Does not commit.
+
+    Returns:
+        The `returning` column of each row actually inserted (empty if not requested)
+    """
+    if not rows:
+        return []
+
+    insert_ignore = pg_insert if IS_POSTGRES else sqlite_insert
+    stmt = insert_ignore(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    if returning is None:
+        db.execute(stmt, rows)
+        return []
+    return db.execute(stmt.returning(returning), rows).scalars().all()
+
+
+def bulk_upsert_prices(db: Session, rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Insert price rows, skipping existing (product, timestamp, source) entries.
+    Does not commit.
+
+    Returns:
+        Product of each row actually inserted
+    """
+    return bulk_insert_ignore_duplicates(
+        db, PriceHistory, rows,
+        conflict_columns=["product_id", "timestamp", "source_id"],
+        returning=PriceHistory.product
+    )
+
+
+def bulk_upsert_apy(db: Session, rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Insert APY rows, skipping existing (product, timestamp) entries.
+    Does not commit.
+
+    Returns:
+        Product of each row actually inserted
+    """
+    return bulk_insert_ignore_duplicates(
+        db, APYHistory, rows,
+        conflict_columns=["product_id", "timestamp"],
+        returning=APYHistory.product
+    )
+
+
 def reset_db():
     """Drop all tables and recreate - USE WITH CAUTION!"""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    seed_dimensions()
+    maintain_partitions()
     print("Database reset complete")
 
 
 if __name__ == "__main__":
-    # Initialize database when run directly
-    init_db()
-    print("Database tables created successfully!")
+    import sys
+
+    if sys.argv[1:] == ["migrate"]:
+        # Convert a database created before the product/source dimension tables
+        migrate_legacy_schema()
+    else:
+        # Initialize database when run directly
+        init_db()
+        print("Database tables created successfully!")
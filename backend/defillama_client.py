@@ -2,10 +2,14 @@
 DefiLlama API Client for fetching ether.fi price and APY data
 Documentation: https://defillama.com/docs/api
 """
+import bisect
+import json
 import httpx
-from typing import Dict, List, Optional, Any
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import asyncio
+from async_cache import async_ttl_cache
 
 # ether.fi contract addresses
 ETHERFI_CONTRACTS = {
@@ -17,13 +21,48 @@ ETHERFI_CONTRACTS = {
 
 DEFILLAMA_COINS_API = "https://coins.llama.fi"
 DEFILLAMA_YIELDS_API = "https://yields.llama.fi"
+# Comma-separated list of every product's address
+_CURRENT_PRICES_URL = f"{DEFILLAMA_COINS_API}/prices/current/" + ",".join(
+    f"ethereum:{addr}" for addr in ETHERFI_CONTRACTS.values()
+)
+YIELDS_CACHE_TTL = 60  # Seconds; the /pools payload is tens of MB
+PRICES_CACHE_TTL = 15  # Seconds; collapses bursts of live-price requests into one call
+HISTORICAL_CONCURRENCY = 10  # In-flight historical price requests per call (rate limiting)
+HISTORICAL_SEARCH_WIDTH = 6 * 3600  # Seconds; DefiLlama's default search window around each timestamp
+
+# Clients without an injected HTTP client share one keep-alive pool
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_shared_client(timeout: float) -> httpx.AsyncClient:
+    """Get the module's pooled HTTP client, creating it on first use"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(timeout=timeout, limits=HTTP_LIMITS)
+    return _shared_client
+
+
+async def aclose():
+    """Close the shared HTTP client (call on application shutdown)"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
 
 
 class DefiLlamaClient:
     """Client for interacting with DefiLlama APIs"""
 
-    def __init__(self, timeout: int = 30):
+    def __init__(self, timeout: int = 30, http_client: Optional[httpx.AsyncClient] = None):
         self.timeout = timeout
+        self.http_client = http_client
+
+    def _session(self):
+        """Use the injected HTTP client if there is one, else the module's pooled client"""
+        if self.http_client is not None:
+            return nullcontext(self.http_client)
+        return nullcontext(_get_shared_client(self.timeout))
 
     async def get_current_prices(self) -> Dict[str, Any]:
         """
@@ -36,38 +75,41 @@ class DefiLlamaClient:
                 ...
             }
         """
-        # Build comma-separated list of addresses
-        addresses = ",".join([f"ethereum:{addr}" for addr in ETHERFI_CONTRACTS.values()])
-        url = f"{DEFILLAMA_COINS_API}/prices/current/{addresses}"
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
+        try:
+            prices = await self._fetch_current_prices()
+        except httpx.HTTPError as e:
+            print(f"HTTP error fetching prices: {e}")
+            return {}
+        except Exception as e:
+            print(f"Error fetching current prices: {e}")
+            return {}
+
+        # The cached result is shared by every caller; hand out a copy callers may modify
+        return {product: dict(price) for product, price in prices.items()}
+
+    @async_ttl_cache(ttl=PRICES_CACHE_TTL)
+    async def _fetch_current_prices(self) -> Dict[str, Any]:
+        """Fetch every product's price in one request (shared by all instances)"""
+        async with self._session() as client:
+            response = await client.get(_CURRENT_PRICES_URL)
+            response.raise_for_status()
+            data = response.json()
+
+        # Transform response to product-name keys
+        result = {}
+        for product, contract_addr in ETHERFI_CONTRACTS.items():
+            key = f"ethereum:{contract_addr}"
+            if key in data.get("coins", {}):
+                coin_data = data["coins"][key]
+                result[product] = {
+                    "price": coin_data.get("price"),
+                    "symbol": coin_data.get("symbol"),
+                    "timestamp": coin_data.get("timestamp"),
+                    "confidence": coin_data.get("confidence"),
+                    "decimals": coin_data.get("decimals")
+                }
 
-                # Transform response to product-name keys
-                result = {}
-                for product, contract_addr in ETHERFI_CONTRACTS.items():
-                    key = f"ethereum:{contract_addr}"
-                    if key in data.get("coins", {}):
-                        coin_data = data["coins"][key]
-                        result[product] = {
-                            "price": coin_data.get("price"),
-                            "symbol": coin_data.get("symbol"),
-                            "timestamp": coin_data.get("timestamp"),
-                            "confidence": coin_data.get("confidence"),
-                            "decimals": coin_data.get("decimals")
-                        }
-
-                return result
-
-            except httpx.HTTPError as e:
-                print(f"HTTP error fetching prices: {e}")
-                return {}
-            except Exception as e:
-                print(f"Error fetching current prices: {e}")
-                return {}
+        return result
 
     async def get_historical_prices(
         self,
@@ -98,65 +140,136 @@ class DefiLlamaClient:
             day_seconds = 86400
             timestamps = [now - (i * day_seconds) for i in range(days_back)]
 
-        results = []
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            # Batch request for historical prices
-            for ts in timestamps:
-                url = f"{DEFILLAMA_COINS_API}/prices/historical/{ts}/ethereum:{contract_addr}"
-                try:
-                    response = await client.get(url)
-                    response.raise_for_status()
-                    data = response.json()
-
-                    key = f"ethereum:{contract_addr}"
-                    if key in data.get("coins", {}):
-                        coin_data = data["coins"][key]
-                        results.append({
-                            "timestamp": ts,
-                            "price": coin_data.get("price"),
-                            "symbol": coin_data.get("symbol"),
-                            "confidence": coin_data.get("confidence")
-                        })
-
-                    # Rate limiting - small delay between requests
-                    await asyncio.sleep(0.1)
-
-                except Exception as e:
-                    print(f"Error fetching historical price at {ts}: {e}")
-                    continue
+        key = f"ethereum:{contract_addr}"
+        async with self._session() as client:
+            # One batch request for every timestamp; fetch any it didn't cover one by one
+            results, missing = await self._fetch_batch_historical(client, key, timestamps)
+            if missing:
+                results.extend(await self._fetch_historical_points(client, key, missing))
 
         return sorted(results, key=lambda x: x["timestamp"])
 
-    async def get_yields_data(self) -> List[Dict[str, Any]]:
-        """
-        Fetch APY/yield data for all ether.fi pools from DefiLlama Yields API
+    async def _fetch_batch_historical(
+        self,
+        client: httpx.AsyncClient,
+        key: str,
+        timestamps: List[int]
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Fetch many timestamps via /batchHistorical; returns (points, timestamps not covered)"""
+        try:
+            response = await client.get(
+                f"{DEFILLAMA_COINS_API}/batchHistorical",
+                params={"coins": json.dumps({key: timestamps}, separators=(",", ":"))}
+            )
+            response.raise_for_status()
+            coin_data = response.json().get("coins", {}).get(key, {})
+        except Exception as e:
+            print(f"Error fetching batch historical prices: {e}")
+            return [], list(timestamps)
+
+        # Points come back at the nearest recorded time; report each against the
+        # requested timestamp it answers, like the per-timestamp endpoint does
+        requested = sorted(set(timestamps))
+        points = {}
+        for point in coin_data.get("prices", []):
+            point_ts = point.get("timestamp")
+            if point_ts is None:
+                continue
+            i = bisect.bisect_left(requested, point_ts)
+            nearest = min(requested[max(i - 1, 0):i + 1], key=lambda ts: abs(ts - point_ts))
+            if abs(nearest - point_ts) <= HISTORICAL_SEARCH_WIDTH and nearest not in points:
+                points[nearest] = {
+                    "timestamp": nearest,
+                    "price": point.get("price"),
+                    "symbol": coin_data.get("symbol"),
+                    "confidence": point.get("confidence")
+                }
 
-        Returns:
-            List of pool data with APY information
-        """
-        url = f"{DEFILLAMA_YIELDS_API}/pools"
+        missing = [ts for ts in requested if ts not in points]
+        return list(points.values()), missing
+
+    async def _fetch_historical_points(
+        self,
+        client: httpx.AsyncClient,
+        key: str,
+        timestamps: List[int]
+    ) -> List[Dict[str, Any]]:
+        """Fetch timestamps one request each (bounded concurrency)"""
+        # Rate limiting - bound how many requests are in flight at once
+        slots = asyncio.Semaphore(HISTORICAL_CONCURRENCY)
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        async def fetch(ts: int) -> Optional[Dict[str, Any]]:
+            url = f"{DEFILLAMA_COINS_API}/prices/historical/{ts}/{key}"
             try:
-                response = await client.get(url)
+                async with slots:
+                    response = await client.get(url)
                 response.raise_for_status()
                 data = response.json()
 
-                # Filter for ether.fi pools
-                pools = data.get("data", [])
-                etherfi_pools = [
-                    pool for pool in pools
-                    if pool.get("project", "").lower() in ["ether.fi", "ether-fi", "etherfi"]
-                ]
-
-                return etherfi_pools
+                coin_data = data.get("coins", {}).get(key)
+                if coin_data is None:
+                    return None
+                return {
+                    "timestamp": ts,
+                    "price": coin_data.get("price"),
+                    "symbol": coin_data.get("symbol"),
+                    "confidence": coin_data.get("confidence")
+                }
 
-            except httpx.HTTPError as e:
-                print(f"HTTP error fetching yields: {e}")
-                return []
             except Exception as e:
-                print(f"Error fetching yields data: {e}")
-                return []
+                print(f"Error fetching historical price at {ts}: {e}")
+                return None
+
+        points = await asyncio.gather(*(fetch(ts) for ts in timestamps))
+        return [point for point in points if point is not None]
+
+    @async_ttl_cache(ttl=YIELDS_CACHE_TTL)
+    async def _fetch_yields(self) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Download the ether.fi pools and index them by product (shared by all instances)"""
+        url = f"{DEFILLAMA_YIELDS_API}/pools"
+
+        async with self._session() as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            data = response.json()
+
+        # Filter for ether.fi pools
+        pools = data.get("data", [])
+        etherfi_pools = [
+            pool for pool in pools
+            if pool.get("project", "").lower() in ["ether.fi", "ether-fi", "etherfi"]
+        ]
+
+        # First pool whose id contains each product's contract address
+        pools_by_product = {}
+        for product, contract_addr in ETHERFI_CONTRACTS.items():
+            addr_lower = contract_addr.lower()
+            for pool in etherfi_pools:
+                if addr_lower in pool.get("pool", "").lower():
+                    pools_by_product[product] = pool
+                    break
+
+        return etherfi_pools, pools_by_product
+
+    async def _get_yields(self) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        try:
+            return await self._fetch_yields()
+        except httpx.HTTPError as e:
+            print(f"HTTP error fetching yields: {e}")
+            return [], {}
+        except Exception as e:
+            print(f"Error fetching yields data: {e}")
+            return [], {}
+
+    async def get_yields_data(self) -> List[Dict[str, Any]]:
+        """
+        Fetch APY/yield data for all ether.fi pools from DefiLlama Yields API
+
+        Returns:
+            List of pool data with APY information
+        """
+        pools, _ = await self._get_yields()
+        return list(pools)  # Callers get their own list; the cached one is shared
 
     async def get_apy_for_product(self, product: str) -> Optional[Dict[str, Any]]:
         """
@@ -171,25 +284,21 @@ class DefiLlamaClient:
         if product not in ETHERFI_CONTRACTS:
             return None
 
-        yields_data = await self.get_yields_data()
-        contract_addr = ETHERFI_CONTRACTS[product].lower()
-
-        # Find matching pool
-        for pool in yields_data:
-            pool_id = pool.get("pool", "").lower()
-            if contract_addr in pool_id:
-                return {
-                    "product": product,
-                    "apy_base": pool.get("apyBase", 0),
-                    "apy_reward": pool.get("apyReward", 0),
-                    "apy_total": pool.get("apy", 0),
-                    "tvl_usd": pool.get("tvlUsd", 0),
-                    "symbol": pool.get("symbol"),
-                    "chain": pool.get("chain"),
-                    "project": pool.get("project")
-                }
+        _, pools_by_product = await self._get_yields()
+        pool = pools_by_product.get(product)
+        if pool is None:
+            return None
 
-        return None
+        return {
+            "product": product,
+            "apy_base": pool.get("apyBase", 0),
+            "apy_reward": pool.get("apyReward", 0),
+            "apy_total": pool.get("apy", 0),
+            "tvl_usd": pool.get("tvlUsd", 0),
+            "symbol": pool.get("symbol"),
+            "chain": pool.get("chain"),
+            "project": pool.get("project")
+        }
 
     async def get_all_apys(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -198,27 +307,19 @@ class DefiLlamaClient:
         Returns:
             Dict with product names as keys and APY data as values
         """
-        yields_data = await self.get_yields_data()
-        result = {}
-
-        for product, contract_addr in ETHERFI_CONTRACTS.items():
-            addr_lower = contract_addr.lower()
-
-            # Find matching pool
-            for pool in yields_data:
-                pool_id = pool.get("pool", "").lower()
-                if addr_lower in pool_id:
-                    result[product] = {
-                        "apy_base": pool.get("apyBase", 0),
-                        "apy_reward": pool.get("apyReward", 0),
-                        "apy_total": pool.get("apy", 0),
-                        "tvl_usd": pool.get("tvlUsd", 0),
-                        "symbol": pool.get("symbol"),
-                        "chain": pool.get("chain")
-                    }
-                    break
+        _, pools_by_product = await self._get_yields()
 
-        return result
+        return {
+            product: {
+                "apy_base": pool.get("apyBase", 0),
+                "apy_reward": pool.get("apyReward", 0),
+                "apy_total": pool.get("apy", 0),
+                "tvl_usd": pool.get("tvlUsd", 0),
+                "symbol": pool.get("symbol"),
+                "chain": pool.get("chain")
+            }
+            for product, pool in pools_by_product.items()
+        }
 
     async def get_chart_data(self, product: str) -> Dict[str, Any]:
         """
@@ -244,6 +345,14 @@ class DefiLlamaClient:
         }
 
 
+_default_client = DefiLlamaClient()
+
+
+def get_defillama_client() -> DefiLlamaClient:
+    """FastAPI dependency returning the process-wide client"""
+    return _default_client
+
+
 # Convenience functions for FastAPI endpoints
 async def fetch_live_prices() -> Dict[str, Any]:
     """Fetch live prices for all ether.fi products"""
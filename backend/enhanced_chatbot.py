@@ -13,7 +13,7 @@ except ImportError:
     ANTHROPIC_AVAILABLE = False
 
 try:
-    from defi_knowledge_base import knowledge_base, get_market_context, get_product_context
+    from defi_knowledge_base import get_knowledge_base, get_market_context, get_product_context
     KNOWLEDGE_BASE_AVAILABLE = True
 except ImportError:
     KNOWLEDGE_BASE_AVAILABLE = False
@@ -221,7 +221,7 @@ Please provide a helpful, accurate answer using the context above. Include relev
         if concepts_to_include and KNOWLEDGE_BASE_AVAILABLE:
             for concept_key in concepts_to_include:
                 try:
-                    concept_info = knowledge_base.get_concept_info(concept_key)
+                    concept_info = get_knowledge_base().get_concept_info(concept_key)
                     if concept_info:
                         context_parts.append(f"""
 {concept_info['name']}:
@@ -2,9 +2,14 @@
 Enhanced Portfolio Analyzer with Real API Data
 Integrates Beaconcha.in, Uniswap, EigenExplorer, and DefiLlama for comprehensive portfolio analysis
 """
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel
+import asyncio
+import bisect
+import httpx
+from typing import Dict, List, Optional, Any, Sequence
 from datetime import datetime
+from async_cache import (
+    FETCH_ERRORS, HTTP_LIMITS, HTTP_TIMEOUT, ResponseModel, async_ttl_cache, call_upstream
+)
 
 # Import all API clients
 try:
@@ -17,8 +22,23 @@ except ImportError:
     REAL_DATA_AVAILABLE = False
     print("Warning: Real API clients not available")
 
+API_CACHE_TTL = 30  # Seconds to reuse prices, APYs and restaking data across analyses
 
-class PortfolioAsset(BaseModel):
+# Defaults used when an upstream API is unavailable
+_FALLBACK_PRICES = {"ETH": 3500, "eETH": 3500, "weETH": 3600}
+_FALLBACK_APY = {"eETH": 3.2, "weETH": 3.2, "LiquidUSD": 10.0}
+_FALLBACK_RISK = {"operator_risk": 30, "uptime_pct": 99.5}
+_FALLBACK_LIQUIDITY = {"weETH_liquidity": 95, "eETH_liquidity": 85}
+_FALLBACK_RESTAKING = {"restaked_pct": 62.0, "largest_avs_pct": 46.2}
+
+# Score tables: value >= THRESHOLDS[i] maps to SCORES[i + 1]
+_UPTIME_THRESHOLDS = (99.0, 99.5, 99.9)
+_UPTIME_RISKS = (60, 40, 25, 15)  # Operator risk, lower is better
+_TVL_THRESHOLDS = (10_000_000, 20_000_000, 50_000_000)
+_TVL_LIQUIDITY_SCORES = (70, 80, 90, 100)
+
+
+class PortfolioAsset(ResponseModel):
     """Individual asset in portfolio"""
     symbol: str
     balance: float
@@ -29,7 +49,7 @@ class PortfolioAsset(BaseModel):
     liquidity_score: int  # 0-100
 
 
-class PortfolioMetrics(BaseModel):
+class PortfolioMetrics(ResponseModel):
     """Portfolio-wide metrics"""
     total_value_usd: float
     total_staked_eth: float
@@ -40,42 +60,123 @@ class PortfolioMetrics(BaseModel):
     diversification_score: int
 
 
-class StrategyRecommendation(BaseModel):
+class StrategyRecommendation(ResponseModel):
     """Strategy recommendation based on real data"""
     name: str
     description: str
     expected_apy: float
     risk_level: str
-    steps: List[str]
-    pros: List[str]
-    cons: List[str]
-    data_sources: List[str]
+    steps: Sequence[str]  # Static copy is shared as module-level tuples
+    pros: Sequence[str]
+    cons: Sequence[str]
+    data_sources: Sequence[str]
 
 
-class PortfolioAnalysisResult(BaseModel):
+class PortfolioAnalysisResult(ResponseModel):
     """Complete portfolio analysis"""
     timestamp: str
     assets: List[PortfolioAsset]
     metrics: PortfolioMetrics
     recommendations: List[StrategyRecommendation]
     market_context: Dict[str, Any]
-    data_quality: str
+    data_quality: str  # "real", "partial" (some sections fell back to defaults) or "mock"
+
+
+# Fixed recommendation copy; only lines that quote live data are built per call
+_CONSERVATIVE_CONS = (
+    "Limited upside potential",
+    "Not maximizing yield opportunities"
+)
+_CONSERVATIVE_SOURCES = ("Beaconcha.in", "DefiLlama", "Uniswap")
+
+_YIELD_STEPS = (
+    "Supply weETH as collateral",
+    "Borrow stablecoins at ≤50% LTV",
+    "Deploy to Liquid USD (10% APY)",
+    "Monitor liquidation risk"
+)
+_YIELD_CONS = (
+    "Liquidation risk if ETH drops",
+    "Interest rate volatility",
+    "Smart contract risk"
+)
+_YIELD_SOURCES = ("Uniswap Subgraph", "DefiLlama")
+
+_DIVERSIFICATION_STEPS = (
+    "Reduce single-AVS exposure (currently concentrated)",
+    "Split allocation across eETH and weETH",
+    "Consider multi-chain deployment",
+    "Add uncorrelated assets"
+)
+_DIVERSIFICATION_PROS = (
+    "Lower protocol concentration risk",
+    "Multi-chain liquidity options",
+    "Better risk-adjusted returns"
+)
+_DIVERSIFICATION_CONS = (
+    "Slightly lower raw APY",
+    "More complex management",
+    "Higher gas costs for rebalancing"
+)
+_DIVERSIFICATION_SOURCES = ("EigenExplorer", "Uniswap Subgraph")
+
+
+async def _use_default(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Stand-in for a fetch that an analysis doesn't need"""
+    return value
 
 
 class EnhancedPortfolioAnalyzer:
     """Analyzes portfolio using real API data"""
 
+    # Result for an all-zero portfolio, built once from the fallback defaults
+    _empty_result: Optional[PortfolioAnalysisResult] = None
+
     def __init__(self):
-        if REAL_DATA_AVAILABLE:
-            self.defillama = DefiLlamaClient()
-            self.beacon = BeaconchainClient()
-            self.uniswap = UniswapClient()
-            self.eigen = EigenExplorerClient()
-        else:
-            self.defillama = None
-            self.beacon = None
-            self.uniswap = None
-            self.eigen = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._reset_clients()
+
+    def _reset_clients(self):
+        # API clients are created on first use, so analyses only build the ones they need
+        self._defillama = None
+        self._beacon = None
+        self._uniswap = None
+        self._eigen = None
+
+    @property
+    def defillama(self) -> Optional["DefiLlamaClient"]:
+        if self._defillama is None and REAL_DATA_AVAILABLE:
+            self._defillama = DefiLlamaClient(http_client=self._http_client)
+        return self._defillama
+
+    @property
+    def beacon(self) -> Optional["BeaconchainClient"]:
+        if self._beacon is None and REAL_DATA_AVAILABLE:
+            self._beacon = BeaconchainClient(http_client=self._http_client)
+        return self._beacon
+
+    @property
+    def uniswap(self) -> Optional["UniswapClient"]:
+        if self._uniswap is None and REAL_DATA_AVAILABLE:
+            self._uniswap = UniswapClient(http_client=self._http_client)
+        return self._uniswap
+
+    @property
+    def eigen(self) -> Optional["EigenExplorerClient"]:
+        if self._eigen is None and REAL_DATA_AVAILABLE:
+            self._eigen = EigenExplorerClient()
+        return self._eigen
+
+    async def __aenter__(self):
+        """Route all API clients through one pooled HTTP client"""
+        self._http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        self._reset_clients()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
 
     async def analyze_portfolio(
         self,
@@ -96,31 +197,77 @@ class EnhancedPortfolioAnalyzer:
         Returns:
             Complete portfolio analysis with real data
         """
-        # Step 1: Get current prices from DefiLlama
-        prices = await self._get_current_prices()
-
-        # Step 2: Get APY data from DefiLlama
-        apy_data = await self._get_apy_data()
-
-        # Step 3: Get risk metrics from Beaconcha.in
-        risk_metrics = await self._get_risk_metrics()
-
-        # Step 4: Get liquidity data from Uniswap
-        liquidity_data = await self._get_liquidity_data()
+        # Nothing held: skip the API round-trips and reuse the prebuilt empty result
+        if not (eth_balance or eeth_balance or weeth_balance or liquid_usd_balance):
+            if EnhancedPortfolioAnalyzer._empty_result is None:
+                EnhancedPortfolioAnalyzer._empty_result = await self._build_result(
+                    0.0, 0.0, 0.0, 0.0,
+                    _FALLBACK_PRICES, _FALLBACK_APY, _FALLBACK_RISK, _FALLBACK_LIQUIDITY, _FALLBACK_RESTAKING,
+                    data_quality="mock"
+                )
+            return self._empty_result.model_copy(update={"timestamp": datetime.now().isoformat()})
+
+        # Prices/APY (DefiLlama), risk (Beaconcha.in), liquidity (Uniswap) and
+        # restaking (EigenExplorer) are independent - fetch them concurrently.
+        # Operator risk and restaking data only matter when eETH/weETH are held.
+        holds_staked_eth = bool(eeth_balance or weeth_balance)
+        results = await asyncio.gather(
+            self._get_current_prices(),
+            self._get_apy_data(),
+            self._get_risk_metrics() if holds_staked_eth else _use_default(_FALLBACK_RISK),
+            self._get_liquidity_data(),
+            self._get_restaking_data() if holds_staked_eth else _use_default(_FALLBACK_RESTAKING),
+            return_exceptions=True
+        )
+        fallbacks = (_FALLBACK_PRICES, _FALLBACK_APY, _FALLBACK_RISK, _FALLBACK_LIQUIDITY, _FALLBACK_RESTAKING)
+        sections = [
+            fallback if isinstance(result, Exception) else result
+            for result, fallback in zip(results, fallbacks)
+        ]
+        prices, apy_data, risk_metrics, liquidity_data, restaking_data = sections
+
+        # Sections served from defaults (not needed for this portfolio, or the upstream
+        # failed) are the fallback objects themselves; flag the result as partially mock
+        if not REAL_DATA_AVAILABLE:
+            data_quality = "mock"
+        elif any(section is fallback for section, fallback in zip(sections, fallbacks)):
+            data_quality = "partial"
+        else:
+            data_quality = "real"
 
-        # Step 5: Get restaking data from EigenExplorer
-        restaking_data = await self._get_restaking_data()
+        return await self._build_result(
+            eth_balance, eeth_balance, weeth_balance, liquid_usd_balance,
+            prices, apy_data, risk_metrics, liquidity_data, restaking_data,
+            data_quality=data_quality
+        )
 
-        # Build portfolio assets
+    async def _build_result(
+        self,
+        eth_balance: float,
+        eeth_balance: float,
+        weeth_balance: float,
+        liquid_usd_balance: float,
+        prices: Dict[str, float],
+        apy_data: Dict[str, float],
+        risk_metrics: Dict[str, Any],
+        liquidity_data: Dict[str, Any],
+        restaking_data: Dict[str, Any],
+        data_quality: str
+    ) -> PortfolioAnalysisResult:
+        """Build assets, metrics and recommendations from fetched market data"""
+        # Build portfolio assets. Every value here is computed in-process (balances were
+        # validated at the HTTP layer), so models are built with model_construct and
+        # upstream numbers are coerced with float() instead of running pydantic validation.
         assets = []
 
         # ETH
         if eth_balance > 0:
-            assets.append(PortfolioAsset(
+            price = float(prices.get("ETH", 3500))
+            assets.append(PortfolioAsset.model_construct(
                 symbol="ETH",
-                balance=eth_balance,
-                current_price=prices.get("ETH", 3500),
-                value_usd=eth_balance * prices.get("ETH", 3500),
+                balance=float(eth_balance),
+                current_price=price,
+                value_usd=eth_balance * price,
                 apy=0.0,
                 risk_score=25,  # Base ETH is low risk
                 liquidity_score=100  # ETH is highly liquid
@@ -128,71 +275,76 @@ class EnhancedPortfolioAnalyzer:
 
         # eETH
         if eeth_balance > 0:
-            assets.append(PortfolioAsset(
+            price = float(prices.get("eETH", 3500))
+            assets.append(PortfolioAsset.model_construct(
                 symbol="eETH",
-                balance=eeth_balance,
-                current_price=prices.get("eETH", 3500),
-                value_usd=eeth_balance * prices.get("eETH", 3500),
-                apy=apy_data.get("eETH", 3.2),
+                balance=float(eeth_balance),
+                current_price=price,
+                value_usd=eeth_balance * price,
+                apy=float(apy_data.get("eETH", 3.2)),
                 risk_score=risk_metrics.get("operator_risk", 30),
                 liquidity_score=liquidity_data.get("eETH_liquidity", 85)
             ))
 
         # weETH
         if weeth_balance > 0:
-            assets.append(PortfolioAsset(
+            price = float(prices.get("weETH", 3600))
+            assets.append(PortfolioAsset.model_construct(
                 symbol="weETH",
-                balance=weeth_balance,
-                current_price=prices.get("weETH", 3600),
-                value_usd=weeth_balance * prices.get("weETH", 3600),
-                apy=apy_data.get("weETH", 3.2),
+                balance=float(weeth_balance),
+                current_price=price,
+                value_usd=weeth_balance * price,
+                apy=float(apy_data.get("weETH", 3.2)),
                 risk_score=risk_metrics.get("operator_risk", 30),
                 liquidity_score=liquidity_data.get("weETH_liquidity", 95)
             ))
 
         # Liquid USD
         if liquid_usd_balance > 0:
-            assets.append(PortfolioAsset(
+            assets.append(PortfolioAsset.model_construct(
                 symbol="LiquidUSD",
-                balance=liquid_usd_balance,
+                balance=float(liquid_usd_balance),
                 current_price=1.0,
-                value_usd=liquid_usd_balance,
-                apy=apy_data.get("LiquidUSD", 10.0),
+                value_usd=float(liquid_usd_balance),
+                apy=float(apy_data.get("LiquidUSD", 10.0)),
                 risk_score=40,  # Stablecoin protocol risk
                 liquidity_score=100  # USD is highly liquid
             ))
 
-        # Calculate portfolio metrics
-        total_value = sum(asset.value_usd for asset in assets)
-        weighted_apy = sum(
-            asset.value_usd * asset.apy for asset in assets
-        ) / total_value if total_value > 0 else 0
-
-        weighted_risk = sum(
-            asset.value_usd * asset.risk_score for asset in assets
-        ) / total_value if total_value > 0 else 0
-
-        avg_liquidity = sum(
-            asset.value_usd * asset.liquidity_score for asset in assets
-        ) / total_value if total_value > 0 else 0
+        # Calculate portfolio metrics in a single pass over the assets
+        total_value = apy_sum = risk_sum = liquidity_sum = squared_sum = 0.0
+        for asset in assets:
+            value = asset.value_usd
+            total_value += value
+            apy_sum += value * asset.apy
+            risk_sum += value * asset.risk_score
+            liquidity_sum += value * asset.liquidity_score
+            squared_sum += value * value
+
+        if total_value > 0:
+            weighted_apy = apy_sum / total_value
+            weighted_risk = risk_sum / total_value
+            avg_liquidity = liquidity_sum / total_value
+        else:
+            weighted_apy = weighted_risk = avg_liquidity = 0.0
 
         # Calculate diversification score (0-100)
         # Higher = more diversified
         num_assets = len(assets)
-        if num_assets == 0:
-            diversification = 0
-        elif num_assets == 1:
+        if num_assets == 1:
             diversification = 20
-        else:
-            # Calculate Herfindahl index
-            allocations = [asset.value_usd / total_value for asset in assets]
-            hhi = sum(alloc ** 2 for alloc in allocations)
+        elif num_assets >= 2 and total_value > 0:
+            # Herfindahl index: sum of squared allocations = sum(v^2) / total^2
+            hhi = squared_sum / (total_value * total_value)
             diversification = int((1 - hhi) * 100)
+        else:
+            # No assets, or holdings with no priced value
+            diversification = 0
 
-        metrics = PortfolioMetrics(
+        metrics = PortfolioMetrics.model_construct(
             total_value_usd=total_value,
-            total_staked_eth=eeth_balance + weeth_balance,
-            total_restaked_pct=restaking_data.get("restaked_pct", 62.0),
+            total_staked_eth=float(eeth_balance + weeth_balance),
+            total_restaked_pct=float(restaking_data.get("restaked_pct", 62.0)),
             blended_apy=weighted_apy,
             overall_risk_score=int(weighted_risk),
             liquidity_health=int(avg_liquidity),
@@ -213,66 +365,73 @@ class EnhancedPortfolioAnalyzer:
             "avs_concentration": restaking_data.get("largest_avs_pct", 46.2)
         }
 
-        return PortfolioAnalysisResult(
+        return PortfolioAnalysisResult.model_construct(
             timestamp=datetime.now().isoformat(),
             assets=assets,
             metrics=metrics,
             recommendations=recommendations,
             market_context=market_context,
-            data_quality="real" if REAL_DATA_AVAILABLE else "mock"
+            data_quality=data_quality
         )
 
+    # Each cached _fetch_* raises on failure so fallbacks are never cached;
+    # the _get_* wrappers add the fallback. The DefiLlama client returns empty
+    # payloads instead of raising, so a missing product counts as a failure (KeyError)
+    @async_ttl_cache(ttl=API_CACHE_TTL)
+    async def _fetch_current_prices(self) -> Dict[str, float]:
+        prices = await call_upstream(self.defillama.get_current_prices())
+        return {
+            "ETH": 3500,  # Use market ETH price
+            "eETH": prices["eETH"]["price"],
+            "weETH": prices["weETH"]["price"],
+            "ETHFI": prices["ETHFI"]["price"]
+        }
+
     async def _get_current_prices(self) -> Dict[str, float]:
         """Get current prices from DefiLlama"""
         if not self.defillama:
-            return {"ETH": 3500, "eETH": 3500, "weETH": 3600}
+            return _FALLBACK_PRICES
 
         try:
-            prices = await self.defillama.get_current_prices()
-            return {
-                "ETH": 3500,  # Use market ETH price
-                "eETH": prices.get("eETH", {}).get("price", 3500),
-                "weETH": prices.get("weETH", {}).get("price", 3600),
-                "ETHFI": prices.get("ETHFI", {}).get("price", 2.5)
-            }
-        except:
-            return {"ETH": 3500, "eETH": 3500, "weETH": 3600}
+            return await self._fetch_current_prices()
+        except FETCH_ERRORS:
+            return _FALLBACK_PRICES
+
+    @async_ttl_cache(ttl=API_CACHE_TTL)
+    async def _fetch_apy_data(self) -> Dict[str, float]:
+        apy_data = await call_upstream(self.defillama.get_all_apys())
+        eeth = apy_data["eETH"]
+        return {
+            "eETH": eeth["apy_total"],
+            "weETH": apy_data["weETH"]["apy_total"],
+            "LiquidUSD": 10.0,  # Assumed
+            "total_tvl": eeth["tvl_usd"]
+        }
 
     async def _get_apy_data(self) -> Dict[str, float]:
         """Get APY data from DefiLlama"""
         if not self.defillama:
-            return {"eETH": 3.2, "weETH": 3.2, "LiquidUSD": 10.0}
+            return _FALLBACK_APY
 
         try:
-            apy_data = await self.defillama.get_all_apys()
-            return {
-                "eETH": apy_data.get("eETH", {}).get("apy_total", 3.2),
-                "weETH": apy_data.get("weETH", {}).get("apy_total", 3.2),
-                "LiquidUSD": 10.0,  # Assumed
-                "total_tvl": apy_data.get("eETH", {}).get("tvl_usd", 8500000000)
-            }
-        except:
-            return {"eETH": 3.2, "weETH": 3.2, "LiquidUSD": 10.0}
+            return await self._fetch_apy_data()
+        except FETCH_ERRORS:
+            return _FALLBACK_APY
 
     async def _get_risk_metrics(self) -> Dict[str, Any]:
         """Get risk metrics from Beaconcha.in"""
         if not self.beacon:
-            return {"operator_risk": 30, "uptime_pct": 99.5}
+            return _FALLBACK_RISK
 
         try:
-            uptime = await self.beacon.calculate_uptime_metrics()
-            dvt = await self.beacon.check_dvt_protection()
+            uptime, dvt = await asyncio.gather(
+                call_upstream(self.beacon.calculate_uptime_metrics()),
+                call_upstream(self.beacon.check_dvt_protection())
+            )
 
             # Calculate operator risk score (0-100, lower is better)
             uptime_pct = uptime.get("uptime_pct", 99.5)
-            if uptime_pct >= 99.9:
-                operator_risk = 15
-            elif uptime_pct >= 99.5:
-                operator_risk = 25
-            elif uptime_pct >= 99.0:
-                operator_risk = 40
-            else:
-                operator_risk = 60
+            operator_risk = _UPTIME_RISKS[bisect.bisect_right(_UPTIME_THRESHOLDS, uptime_pct)]
 
             # DVT reduces risk
             if dvt.get("dvt_enabled"):
@@ -283,33 +442,26 @@ class EnhancedPortfolioAnalyzer:
                 "uptime_pct": uptime_pct,
                 "dvt_enabled": dvt.get("dvt_enabled", True)
             }
-        except:
-            return {"operator_risk": 30, "uptime_pct": 99.5}
+        except FETCH_ERRORS:
+            return _FALLBACK_RISK
 
     async def _get_liquidity_data(self) -> Dict[str, Any]:
         """Get liquidity data from Uniswap"""
         if not self.uniswap:
-            return {"weETH_liquidity": 95, "eETH_liquidity": 85}
+            return _FALLBACK_LIQUIDITY
 
         try:
-            liquidity = await self.uniswap.get_multi_chain_liquidity(10000)
+            liquidity = await call_upstream(self.uniswap.get_multi_chain_liquidity(10000))
 
-            # Calculate liquidity score from total TVL
-            total_tvl = sum(
-                chain.get("total_tvl_usd", 0) for chain in liquidity
-            )
+            # Total TVL and venue list in one pass
+            total_tvl = 0
+            venues = []
+            for chain in liquidity:
+                total_tvl += chain.get("total_tvl_usd", 0)
+                venues.append(chain.get("chain"))
 
             # Convert TVL to score (0-100)
-            if total_tvl >= 50_000_000:
-                score = 100
-            elif total_tvl >= 20_000_000:
-                score = 90
-            elif total_tvl >= 10_000_000:
-                score = 80
-            else:
-                score = 70
-
-            venues = [chain.get("chain") for chain in liquidity]
+            score = _TVL_LIQUIDITY_SCORES[bisect.bisect_right(_TVL_THRESHOLDS, total_tvl)]
 
             return {
                 "weETH_liquidity": score,
@@ -317,25 +469,31 @@ class EnhancedPortfolioAnalyzer:
                 "total_tvl": total_tvl,
                 "venues": venues
             }
-        except:
-            return {"weETH_liquidity": 95, "eETH_liquidity": 85}
+        except FETCH_ERRORS:
+            return _FALLBACK_LIQUIDITY
+
+    @async_ttl_cache(ttl=API_CACHE_TTL)
+    async def _fetch_restaking_data(self) -> Dict[str, Any]:
+        distribution, concentration = await asyncio.gather(
+            call_upstream(self.eigen.get_restaking_distribution()),
+            call_upstream(self.eigen.calculate_avs_concentration())
+        )
+
+        return {
+            "restaked_pct": distribution.get("restaked_pct", 62.0),
+            "largest_avs_pct": concentration.get("largest_avs_pct", 46.2),
+            "balance_score": distribution.get("balanced_score", 75)
+        }
 
     async def _get_restaking_data(self) -> Dict[str, Any]:
         """Get restaking data from EigenExplorer"""
         if not self.eigen:
-            return {"restaked_pct": 62.0, "largest_avs_pct": 46.2}
+            return _FALLBACK_RESTAKING
 
         try:
-            distribution = await self.eigen.get_restaking_distribution()
-            concentration = await self.eigen.calculate_avs_concentration()
-
-            return {
-                "restaked_pct": distribution.get("restaked_pct", 62.0),
-                "largest_avs_pct": concentration.get("largest_avs_pct", 46.2),
-                "balance_score": distribution.get("balanced_score", 75)
-            }
-        except:
-            return {"restaked_pct": 62.0, "largest_avs_pct": 46.2}
+            return await self._fetch_restaking_data()
+        except FETCH_ERRORS:
+            return _FALLBACK_RESTAKING
 
     async def _generate_recommendations(
         self,
@@ -351,14 +509,14 @@ class EnhancedPortfolioAnalyzer:
 
         # Strategy 1: Conservative Hold
         if metrics.overall_risk_score < 40:
-            recommendations.append(StrategyRecommendation(
+            recommendations.append(StrategyRecommendation.model_construct(
                 name="Conservative Hold",
                 description="Maintain current allocation with low-risk staking",
                 expected_apy=metrics.blended_apy,
                 risk_level="Low",
                 steps=[
                     "Continue holding weETH/eETH for stable staking rewards",
-                    "Monitor validator uptime (currently {:.1f}%)".format(risk_metrics.get("uptime_pct", 99.5)),
+                    f"Monitor validator uptime (currently {risk_metrics.get('uptime_pct', 99.5):.1f}%)",
                     "Maintain Liquid USD position for liquidity"
                 ],
                 pros=[
@@ -366,63 +524,39 @@ class EnhancedPortfolioAnalyzer:
                     "Good liquidity across multiple chains",
                     f"Stable {metrics.blended_apy:.2f}% APY"
                 ],
-                cons=[
-                    "Limited upside potential",
-                    "Not maximizing yield opportunities"
-                ],
-                data_sources=["Beaconcha.in", "DefiLlama", "Uniswap"]
+                cons=_CONSERVATIVE_CONS,
+                data_sources=_CONSERVATIVE_SOURCES
             ))
 
         # Strategy 2: Yield Optimization
         if metrics.liquidity_health > 80:
-            recommendations.append(StrategyRecommendation(
+            leveraged_apy = metrics.blended_apy * 1.5
+            recommendations.append(StrategyRecommendation.model_construct(
                 name="Yield Optimization",
                 description="Leverage weETH collateral for additional yield",
-                expected_apy=metrics.blended_apy * 1.5,
+                expected_apy=leveraged_apy,
                 risk_level="Moderate",
-                steps=[
-                    "Supply weETH as collateral",
-                    "Borrow stablecoins at ≤50% LTV",
-                    "Deploy to Liquid USD (10% APY)",
-                    "Monitor liquidation risk"
-                ],
+                steps=_YIELD_STEPS,
                 pros=[
-                    f"Potential {metrics.blended_apy * 1.5:.2f}% APY",
+                    f"Potential {leveraged_apy:.2f}% APY",
                     "Deep liquidity for unwinding position",
                     f"${liquidity_data.get('total_tvl', 0):,.0f} available liquidity"
                 ],
-                cons=[
-                    "Liquidation risk if ETH drops",
-                    "Interest rate volatility",
-                    "Smart contract risk"
-                ],
-                data_sources=["Uniswap Subgraph", "DefiLlama"]
+                cons=_YIELD_CONS,
+                data_sources=_YIELD_SOURCES
             ))
 
         # Strategy 3: Diversification
         if metrics.diversification_score < 60:
-            recommendations.append(StrategyRecommendation(
+            recommendations.append(StrategyRecommendation.model_construct(
                 name="Diversification",
                 description="Reduce concentration risk across AVS and assets",
                 expected_apy=metrics.blended_apy * 0.9,
                 risk_level="Low-Moderate",
-                steps=[
-                    "Reduce single-AVS exposure (currently concentrated)",
-                    "Split allocation across eETH and weETH",
-                    "Consider multi-chain deployment",
-                    "Add uncorrelated assets"
-                ],
-                pros=[
-                    "Lower protocol concentration risk",
-                    "Multi-chain liquidity options",
-                    "Better risk-adjusted returns"
-                ],
-                cons=[
-                    "Slightly lower raw APY",
-                    "More complex management",
-                    "Higher gas costs for rebalancing"
-                ],
-                data_sources=["EigenExplorer", "Uniswap Subgraph"]
+                steps=_DIVERSIFICATION_STEPS,
+                pros=_DIVERSIFICATION_PROS,
+                cons=_DIVERSIFICATION_CONS,
+                data_sources=_DIVERSIFICATION_SOURCES
             ))
 
         return recommendations
@@ -436,9 +570,9 @@ async def analyze_portfolio_with_real_data(
     liquid_usd: float = 1200.0
 ) -> Dict[str, Any]:
     """Analyze portfolio using real API data"""
-    analyzer = EnhancedPortfolioAnalyzer()
-    result = await analyzer.analyze_portfolio(eth, eeth, weeth, liquid_usd)
-    return result.dict()
+    async with EnhancedPortfolioAnalyzer() as analyzer:
+        result = await analyzer.analyze_portfolio(eth, eeth, weeth, liquid_usd)
+    return result.model_dump(mode="json")
 
 
 # Test function
@@ -477,5 +611,4 @@ async def test_portfolio_analyzer():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_portfolio_analyzer())
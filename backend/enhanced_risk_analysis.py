@@ -2,9 +2,14 @@
 Enhanced Risk Analysis with Real API Data
 Integrates Beaconcha.in, Uniswap, and EigenExplorer for comprehensive risk assessment
 """
+import asyncio
+import bisect
+import httpx
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timezone
-from pydantic import BaseModel
+from async_cache import (
+    EMPTY, FETCH_ERRORS, HTTP_LIMITS, HTTP_TIMEOUT, ResponseModel, async_ttl_cache, call_upstream
+)
 
 # Import API clients
 try:
@@ -16,22 +21,33 @@ except ImportError:
     REAL_DATA_AVAILABLE = False
     print("Warning: Real data clients not available, using mock data")
 
+LIQUIDITY_CACHE_TTL = 30  # Seconds to reuse liquidity depth per trade size
+
+METHODOLOGY_VERSION = "efi-risk-v2.0-real-data"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"  # UTC, with a literal Z suffix
+
+# Banding tables looked up with bisect
+_UPTIME_BAND_THRESHOLDS = (99.0, 99.5)  # Band rises once uptime is strictly above a threshold
+_UPTIME_BANDS = ("Red", "Amber", "Green")
+_GRADE_THRESHOLDS = (35, 65)  # Grade rises once the score reaches a threshold
+_GRADES = ("Safe", "Moderate", "High")
+
 
 # Response models (matching frontend expectations)
-class OperatorUptimeData(BaseModel):
+class OperatorUptimeData(ResponseModel):
     uptime_7d_pct: float
     missed_attestations_7d: int
     dvt_protected: bool
     client_diversity_note: str
 
 
-class AVSConcentrationData(BaseModel):
+class AVSConcentrationData(ResponseModel):
     largest_avs_pct: float
     hhi: float
     avs_split: List[Dict[str, Any]]
 
 
-class SlashingProxyInputs(BaseModel):
+class SlashingProxyInputs(ResponseModel):
     operator_uptime_band: str
     historical_slashes_count: int
     avs_audit_status: str
@@ -39,12 +55,12 @@ class SlashingProxyInputs(BaseModel):
     dvt_presence: bool
 
 
-class SlashingProxyData(BaseModel):
+class SlashingProxyData(ResponseModel):
     proxy_score: int
     inputs: SlashingProxyInputs
 
 
-class LiquidityChainData(BaseModel):
+class LiquidityChainData(ResponseModel):
     chain: str
     venue: str
     pool: str
@@ -53,37 +69,37 @@ class LiquidityChainData(BaseModel):
     est_total_fee_usd: float
 
 
-class LiquidityDepthData(BaseModel):
+class LiquidityDepthData(ResponseModel):
     health_index: int
     reference_trade_usd: int
     chains: List[LiquidityChainData]
     recommended_chain: Optional[str] = None
 
 
-class TilesData(BaseModel):
+class TilesData(ResponseModel):
     operator_uptime: OperatorUptimeData
     avs_concentration: AVSConcentrationData
     slashing_proxy: SlashingProxyData
     liquidity_depth: LiquidityDepthData
 
 
-class DistributionData(BaseModel):
+class DistributionData(ResponseModel):
     base_stake_pct: float
     restaked_pct: float
     balanced_score: int
 
 
-class BreakdownData(BaseModel):
+class BreakdownData(ResponseModel):
     distribution: DistributionData
 
 
-class RiskScoreData(BaseModel):
+class RiskScoreData(ResponseModel):
     score: int
     grade: str
     top_reasons: List[str]
 
 
-class RiskAnalysisResponse(BaseModel):
+class RiskAnalysisResponse(ResponseModel):
     address: str
     timestamp: str
     methodology_version: str
@@ -96,15 +112,30 @@ class EnhancedRiskAnalyzer:
     """Comprehensive risk analyzer using real API data"""
 
     def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._init_clients()
+
+    def _init_clients(self, http_client: Optional[httpx.AsyncClient] = None):
         if REAL_DATA_AVAILABLE:
-            self.beacon_client = BeaconchainClient()
-            self.uniswap_client = UniswapClient()
+            self.beacon_client = BeaconchainClient(http_client=http_client)
+            self.uniswap_client = UniswapClient(http_client=http_client)
             self.eigen_client = EigenExplorerClient()
         else:
             self.beacon_client = None
             self.uniswap_client = None
             self.eigen_client = None
 
+    async def __aenter__(self):
+        """Route all API clients through one pooled HTTP client"""
+        self._http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        self._init_clients(self._http_client)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
     async def get_operator_uptime_data(self) -> OperatorUptimeData:
         """Fetch real operator uptime data from Beaconcha.in"""
         if not self.beacon_client:
@@ -118,12 +149,14 @@ class EnhancedRiskAnalyzer:
 
         try:
             # Get real uptime metrics
-            uptime_data = await self.beacon_client.calculate_uptime_metrics(days=7)
-            dvt_data = await self.beacon_client.check_dvt_protection()
-            client_data = await self.beacon_client.get_client_diversity()
+            uptime_data, dvt_data, client_data = await asyncio.gather(
+                call_upstream(self.beacon_client.calculate_uptime_metrics(days=7)),
+                call_upstream(self.beacon_client.check_dvt_protection()),
+                call_upstream(self.beacon_client.get_client_diversity())
+            )
 
             # Format client diversity note
-            consensus_clients = client_data.get("consensus_clients", {})
+            consensus_clients = client_data.get("consensus_clients", EMPTY)
             client_note = ", ".join([f"{k}({v:.0f}%)" for k, v in consensus_clients.items()])
 
             return OperatorUptimeData(
@@ -133,7 +166,7 @@ class EnhancedRiskAnalyzer:
                 client_diversity_note=client_note or "Mixed clients"
             )
 
-        except Exception as e:
+        except FETCH_ERRORS as e:
             print(f"Error fetching operator uptime: {e}")
             # Return fallback data
             return OperatorUptimeData(
@@ -159,7 +192,7 @@ class EnhancedRiskAnalyzer:
 
         try:
             # Get real AVS concentration
-            concentration = await self.eigen_client.calculate_avs_concentration()
+            concentration = await call_upstream(self.eigen_client.calculate_avs_concentration())
 
             return AVSConcentrationData(
                 largest_avs_pct=concentration.get("largest_avs_pct", 0),
@@ -167,7 +200,7 @@ class EnhancedRiskAnalyzer:
                 avs_split=concentration.get("avs_split", [])
             )
 
-        except Exception as e:
+        except FETCH_ERRORS as e:
             print(f"Error fetching AVS concentration: {e}")
             # Return fallback data
             return AVSConcentrationData(
@@ -176,6 +209,48 @@ class EnhancedRiskAnalyzer:
                 avs_split=[{"name": "Data unavailable", "pct": 100.0}]
             )
 
+    # Cached per trade size; raises on failure so the fallback below is never cached
+    @async_ttl_cache(ttl=LIQUIDITY_CACHE_TTL)
+    async def _fetch_liquidity_depth(self, trade_size_usd: int) -> LiquidityDepthData:
+        # Get real liquidity data across chains
+        all_chain_data = await call_upstream(self.uniswap_client.get_multi_chain_liquidity(trade_size_usd))
+
+        chains_list = []
+        total_tvl = 0
+        best_chain = None  # Lowest slippage seen so far
+
+        for chain_data in all_chain_data:
+            chain_name = chain_data.get("chain", "").capitalize()
+            best_pool = chain_data.get("best_pool")
+
+            if best_pool:
+                chain_entry = LiquidityChainData(
+                    chain=chain_name,
+                    venue=chain_data.get("recommended_venue", "Uniswap V3"),
+                    pool=f"{best_pool.get('token0')}/{best_pool.get('token1')}",
+                    depth_usd=best_pool.get("tvl_usd", 0),
+                    slippage_bps=best_pool.get("slippage_bps", 9999),
+                    est_total_fee_usd=best_pool.get("est_fee_usd", 0)
+                )
+                chains_list.append(chain_entry)
+                total_tvl += best_pool.get("tvl_usd", 0)
+                if best_chain is None or chain_entry.slippage_bps < best_chain.slippage_bps:
+                    best_chain = chain_entry
+
+        # The Uniswap client reports failed chains as entries without pools
+        if not chains_list:
+            raise ValueError("No Uniswap pool data for any chain")
+
+        # Calculate health index
+        health_index = await self.uniswap_client.get_liquidity_depth_score(total_tvl)
+
+        return LiquidityDepthData(
+            health_index=health_index,
+            reference_trade_usd=trade_size_usd,
+            chains=chains_list,
+            recommended_chain=best_chain.chain  # Lowest-slippage chain found above
+        )
+
     async def get_liquidity_depth_data(self, trade_size_usd: int = 10000) -> LiquidityDepthData:
         """Fetch real liquidity data from Uniswap Subgraph"""
         if not self.uniswap_client:
@@ -197,45 +272,8 @@ class EnhancedRiskAnalyzer:
             )
 
         try:
-            # Get real liquidity data across chains
-            all_chain_data = await self.uniswap_client.get_multi_chain_liquidity(trade_size_usd)
-
-            chains_list = []
-            total_tvl = 0
-
-            for chain_data in all_chain_data:
-                chain_name = chain_data.get("chain", "").capitalize()
-                best_pool = chain_data.get("best_pool")
-
-                if best_pool:
-                    chains_list.append(LiquidityChainData(
-                        chain=chain_name,
-                        venue=chain_data.get("recommended_venue", "Uniswap V3"),
-                        pool=f"{best_pool.get('token0')}/{best_pool.get('token1')}",
-                        depth_usd=best_pool.get("tvl_usd", 0),
-                        slippage_bps=best_pool.get("slippage_bps", 9999),
-                        est_total_fee_usd=best_pool.get("est_fee_usd", 0)
-                    ))
-                    total_tvl += best_pool.get("tvl_usd", 0)
-
-            # Calculate health index
-            health_index = await self.uniswap_client.get_liquidity_depth_score(total_tvl)
-
-            # Find recommended chain (lowest slippage)
-            if chains_list:
-                best_chain = min(chains_list, key=lambda x: x.slippage_bps)
-                recommended_chain = best_chain.chain
-            else:
-                recommended_chain = None
-
-            return LiquidityDepthData(
-                health_index=health_index,
-                reference_trade_usd=trade_size_usd,
-                chains=chains_list,
-                recommended_chain=recommended_chain
-            )
-
-        except Exception as e:
+            return await self._fetch_liquidity_depth(trade_size_usd)
+        except FETCH_ERRORS as e:
             print(f"Error fetching liquidity data: {e}")
             # Return fallback data
             return LiquidityDepthData(
@@ -254,7 +292,7 @@ class EnhancedRiskAnalyzer:
         """Calculate slashing risk proxy using EigenExplorer data"""
         if not self.eigen_client:
             # Fallback calculation
-            uptime_band = "Green" if uptime_pct > 99.5 else "Amber" if uptime_pct > 99.0 else "Red"
+            uptime_band = _UPTIME_BANDS[bisect.bisect_left(_UPTIME_BAND_THRESHOLDS, uptime_pct)]
             slashing_score = 18
             if uptime_pct < 99.5:
                 slashing_score += 10
@@ -274,19 +312,19 @@ class EnhancedRiskAnalyzer:
 
         try:
             # Get real slashing risk calculation
-            risk_data = await self.eigen_client.calculate_slashing_risk_score(
+            risk_data = await call_upstream(self.eigen_client.calculate_slashing_risk_score(
                 operator_uptime=uptime_pct,
                 client_diversity_score=client_diversity_score,
                 dvt_enabled=dvt_enabled,
                 avs_audit_status="mixed"
-            )
+            ))
 
             return SlashingProxyData(
                 proxy_score=risk_data.get("proxy_score", 18),
-                inputs=SlashingProxyInputs(**risk_data.get("inputs", {}))
+                inputs=SlashingProxyInputs(**risk_data.get("inputs", EMPTY))
             )
 
-        except Exception as e:
+        except FETCH_ERRORS as e:
             print(f"Error calculating slashing risk: {e}")
             # Return fallback
             return SlashingProxyData(
@@ -311,7 +349,7 @@ class EnhancedRiskAnalyzer:
             )
 
         try:
-            distribution = await self.eigen_client.get_restaking_distribution()
+            distribution = await call_upstream(self.eigen_client.get_restaking_distribution())
 
             return DistributionData(
                 base_stake_pct=distribution.get("base_stake_pct", 0),
@@ -319,7 +357,7 @@ class EnhancedRiskAnalyzer:
                 balanced_score=distribution.get("balanced_score", 0)
             )
 
-        except Exception as e:
+        except FETCH_ERRORS as e:
             print(f"Error fetching distribution: {e}")
             return DistributionData(
                 base_stake_pct=38.0,
@@ -345,12 +383,7 @@ class EnhancedRiskAnalyzer:
         score = max(0, min(100, score))
 
         # Determine grade
-        if score < 35:
-            grade = "Safe"
-        elif score < 65:
-            grade = "Moderate"
-        else:
-            grade = "High"
+        grade = _GRADES[bisect.bisect_right(_GRADE_THRESHOLDS, score)]
 
         # Generate top reasons
         reasons = []
@@ -378,13 +411,15 @@ class EnhancedRiskAnalyzer:
     ) -> RiskAnalysisResponse:
         """Generate complete risk analysis using real data from all sources"""
 
-        # Fetch all data in parallel
-        uptime_data = await self.get_operator_uptime_data()
-        avs_data = await self.get_avs_concentration_data()
-        liquidity_data = await self.get_liquidity_depth_data(10000)
-        distribution_data = await self.get_distribution_data()
+        # Fetch all data in parallel (each fetcher falls back on its own errors)
+        uptime_data, avs_data, liquidity_data, distribution_data = await asyncio.gather(
+            self.get_operator_uptime_data(),
+            self.get_avs_concentration_data(),
+            self.get_liquidity_depth_data(10000),
+            self.get_distribution_data()
+        )
 
-        # Calculate slashing risk
+        # Calculate slashing risk (depends on uptime)
         slashing_data = await self.get_slashing_proxy_data(
             uptime_data.uptime_7d_pct,
             client_diversity_score=75,
@@ -399,23 +434,24 @@ class EnhancedRiskAnalyzer:
             liquidity_data.health_index
         )
 
-        # Build response
-        return RiskAnalysisResponse(
+        # Build response. The tiles were validated when fetched and everything else is
+        # computed here, so the wrappers skip validation via model_construct.
+        return RiskAnalysisResponse.model_construct(
             address=address,
-            timestamp=datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-            methodology_version="efi-risk-v2.0-real-data",
-            risk_score=RiskScoreData(
+            timestamp=datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT),
+            methodology_version=METHODOLOGY_VERSION,
+            risk_score=RiskScoreData.model_construct(
                 score=risk_score_value,
                 grade=grade,
                 top_reasons=top_reasons
             ),
-            tiles=TilesData(
+            tiles=TilesData.model_construct(
                 operator_uptime=uptime_data,
                 avs_concentration=avs_data,
                 slashing_proxy=slashing_data,
                 liquidity_depth=liquidity_data
             ),
-            breakdown=BreakdownData(
+            breakdown=BreakdownData.model_construct(
                 distribution=distribution_data
             )
         )
@@ -424,9 +460,9 @@ class EnhancedRiskAnalyzer:
 # Convenience function for FastAPI endpoint
 async def get_enhanced_risk_analysis(address: str = "0xabc...1234") -> Dict[str, Any]:
     """Get enhanced risk analysis with real API data"""
-    analyzer = EnhancedRiskAnalyzer()
-    result = await analyzer.generate_comprehensive_analysis(address)
-    return result.dict()
+    async with EnhancedRiskAnalyzer() as analyzer:
+        result = await analyzer.generate_comprehensive_analysis(address)
+    return result.model_dump(mode="json")
 
 
 # Test function
@@ -451,5 +487,4 @@ async def test_risk_analyzer():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_risk_analyzer())
@@ -3,10 +3,14 @@ EtherFi Real Data Integration Service
 Fetches live APY rates, prices, and metrics from EtherFi smart contracts
 """
 
+import asyncio
 import os
+import random
 import httpx
+from dataclasses import dataclass
 from typing import Dict, Optional
 from datetime import datetime, timedelta
+from async_cache import async_ttl_cache
 
 # EtherFi Mainnet Contract Addresses
 CONTRACTS = {
@@ -22,110 +26,157 @@ ETHERSCAN_BASE = "https://api.etherscan.io/api"
 
 # DefiLlama for APY data
 DEFILLAMA_BASE = "https://yields.llama.fi"
+ETHERFI_PROJECT_PREFIXES = ("ether.fi", "etherfi")  # DefiLlama slugs, e.g. "ether.fi-stake"
 
 # CoinGecko for price data
 COINGECKO_BASE = "https://api.coingecko.com/api/v3"
 
-# Cache for API responses (avoid rate limits)
-_cache: Dict[str, tuple[datetime, any]] = {}
-CACHE_TTL = timedelta(minutes=5)
+
+# Cached payloads are shared by every caller, so they are immutable
+@dataclass(frozen=True, slots=True)
+class ApyData:
+    apy_stake: float
+    apy_liquid_usd: float
+
+
+@dataclass(frozen=True, slots=True)
+class TvlData:
+    total_tvl: float
+    currency: str = "USD"
+
+
+# Fallbacks used when an upstream API is unavailable
+FALLBACK_ETH_PRICE = 3500.0
+FALLBACK_APY = ApyData(apy_stake=0.032, apy_liquid_usd=0.08)  # ~3.2% ETH staking, ~8% stablecoin yield
+FALLBACK_WEETH_RATE = 1.02  # weETH typically 2% above ETH
+FALLBACK_TVL = TvlData(total_tvl=0)
+
+# Shared HTTP client so every fetcher reuses one keep-alive connection pool
+HTTP_TIMEOUT = 10.0
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+_client: Optional[httpx.AsyncClient] = None
+
+# Transient upstream failures are retried with jittered exponential backoff
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2  # Seconds
+RETRY_MAX_DELAY = 2.0  # Seconds
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _client
+
+
+async def aclose():
+    """Stop the cache refresher and close the shared HTTP client (call on application shutdown)"""
+    global _client, _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _is_retryable(error: httpx.HTTPError) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+async def _get_with_retry(url: str, params: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """GET from the shared client, retrying connection errors, timeouts, 429 and 5xx"""
+    client = await _get_client()
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            if attempt == RETRY_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, delay))
 
 
-def _get_cached(key: str) -> Optional[any]:
-    """Get cached data if still valid"""
-    if key in _cache:
-        timestamp, data = _cache[key]
-        if datetime.now() - timestamp < CACHE_TTL:
-            return data
-    return None
+# Cache for API responses (avoid rate limits)
+CACHE_TTL = 300  # Seconds
+CACHE_REFRESH_INTERVAL = CACHE_TTL - 30  # Re-fetch shortly before entries expire
+_refresh_task: Optional[asyncio.Task] = None
 
 
-def _set_cache(key: str, data: any):
-    """Set cached data with timestamp"""
-    _cache[key] = (datetime.now(), data)
+# Each _fetch_* raises on failure so errors are never cached; the public getters
+# add the fallback.
+@async_ttl_cache(ttl=CACHE_TTL, method=False)
+async def _fetch_eth_price() -> float:
+    response = await _get_with_retry(
+        f"{COINGECKO_BASE}/simple/price",
+        params={"ids": "ethereum", "vs_currencies": "usd"},
+    )
+    data = response.json()
+    return data.get("ethereum", {}).get("usd", FALLBACK_ETH_PRICE)
 
 
 async def get_eth_price() -> float:
     """Get current ETH price in USD from CoinGecko"""
-    cache_key = "eth_price"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
-
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{COINGECKO_BASE}/simple/price",
-                params={"ids": "ethereum", "vs_currencies": "usd"},
-                timeout=10.0,
-            )
-            data = response.json()
-            price = data.get("ethereum", {}).get("usd", 3500.0)
-            _set_cache(cache_key, price)
-            return price
+        return await _fetch_eth_price()
     except Exception as e:
         print(f"Error fetching ETH price: {e}")
-        return 3500.0  # Fallback
+        return FALLBACK_ETH_PRICE
+
+
+@async_ttl_cache(ttl=CACHE_TTL, method=False)
+async def _fetch_etherfi_apy_data() -> ApyData:
+    # DefiLlama pools endpoint
+    response = await _get_with_retry(f"{DEFILLAMA_BASE}/pools")
+    pools = response.json().get("data", [])
+
+    # Extract APYs from EtherFi pools in a single pass
+    apy_stake = 0.0
+    apy_liquid_usd = 0.0
 
+    for pool in pools:
+        project = (pool.get("project") or "").lower()
+        if not project.startswith(ETHERFI_PROJECT_PREFIXES):
+            continue
 
-async def get_etherfi_apy_data() -> Dict[str, float]:
+        symbol = (pool.get("symbol") or "").lower()
+        apy = (pool.get("apy") or 0.0) / 100  # Convert percentage to decimal
+
+        if "eeth" in symbol:  # Also matches weETH
+            apy_stake = max(apy_stake, apy)
+        elif "usd" in symbol or "stable" in symbol:
+            apy_liquid_usd = max(apy_liquid_usd, apy)
+
+    # Fallback to reasonable defaults if not found
+    if apy_stake == 0.0:
+        apy_stake = FALLBACK_APY.apy_stake
+    if apy_liquid_usd == 0.0:
+        apy_liquid_usd = FALLBACK_APY.apy_liquid_usd
+
+    return ApyData(apy_stake=apy_stake, apy_liquid_usd=apy_liquid_usd)
+
+
+async def get_etherfi_apy_data() -> ApyData:
     """
     Get current APY rates for EtherFi products from DefiLlama
-    Returns dict with apyStake and apyLiquidUsd
+    Returns ApyData with apy_stake and apy_liquid_usd
     """
-    cache_key = "etherfi_apy"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
-
     try:
-        async with httpx.AsyncClient() as client:
-            # DefiLlama pools endpoint
-            response = await client.get(
-                f"{DEFILLAMA_BASE}/pools", timeout=10.0
-            )
-            pools = response.json().get("data", [])
-
-            # Find EtherFi pools
-            etherfi_pools = [
-                p for p in pools
-                if "ether.fi" in p.get("project", "").lower()
-                or "etherfi" in p.get("project", "").lower()
-            ]
-
-            # Extract APYs
-            apy_stake = 0.0
-            apy_liquid_usd = 0.0
-
-            for pool in etherfi_pools:
-                symbol = pool.get("symbol", "").lower()
-                apy = pool.get("apy", 0.0) / 100  # Convert percentage to decimal
-
-                if "eeth" in symbol or "weeth" in symbol:
-                    apy_stake = max(apy_stake, apy)
-                elif "usd" in symbol or "stable" in symbol:
-                    apy_liquid_usd = max(apy_liquid_usd, apy)
-
-            # Fallback to reasonable defaults if not found
-            if apy_stake == 0.0:
-                apy_stake = 0.032  # ~3.2% typical ETH staking
-            if apy_liquid_usd == 0.0:
-                apy_liquid_usd = 0.08  # ~8% typical stablecoin yield
-
-            result = {
-                "apyStake": apy_stake,
-                "apyLiquidUsd": apy_liquid_usd,
-            }
-            _set_cache(cache_key, result)
-            return result
-
+        return await _fetch_etherfi_apy_data()
     except Exception as e:
         print(f"Error fetching EtherFi APY data: {e}")
         # Fallback to conservative estimates
-        return {
-            "apyStake": 0.032,
-            "apyLiquidUsd": 0.08,
-        }
+        return FALLBACK_APY
 
 
 async def get_weeth_exchange_rate() -> float:
@@ -133,54 +184,50 @@ async def get_weeth_exchange_rate() -> float:
     Get weETH to ETH exchange rate from Etherscan
     weETH typically trades at a premium to ETH due to staking rewards
     """
-    cache_key = "weeth_rate"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
+    # Reading the rate would call a view function on the weETH contract
+    # (requires ETHERSCAN_API_KEY); for simplicity, we use a typical premium
+    return FALLBACK_WEETH_RATE
 
-    try:
-        if not ETHERSCAN_API_KEY:
-            return 1.02  # Typical 2% premium
 
-        async with httpx.AsyncClient() as client:
-            # Read weETH contract to get exchange rate
-            # This would call a view function on the weETH contract
-            # For simplicity, we'll use a typical premium
-            rate = 1.02  # weETH typically 2% above ETH
-            _set_cache(cache_key, rate)
-            return rate
+@async_ttl_cache(ttl=CACHE_TTL, method=False)
+async def _fetch_etherfi_tvl() -> TvlData:
+    response = await _get_with_retry(f"{DEFILLAMA_BASE}/protocol/ether.fi")
+    data = response.json()
 
-    except Exception as e:
-        print(f"Error fetching weETH rate: {e}")
-        return 1.02
+    tvl = data.get("tvl", [{}])[-1].get("totalLiquidityUSD", 0)
 
+    return TvlData(total_tvl=tvl)
 
-async def get_etherfi_tvl() -> Dict[str, float]:
-    """Get Total Value Locked in EtherFi protocol"""
-    cache_key = "etherfi_tvl"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
 
+async def get_etherfi_tvl() -> TvlData:
+    """Get Total Value Locked in EtherFi protocol"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{DEFILLAMA_BASE}/protocol/ether.fi", timeout=10.0
-            )
-            data = response.json()
+        return await _fetch_etherfi_tvl()
+    except Exception as e:
+        print(f"Error fetching EtherFi TVL: {e}")
+        return FALLBACK_TVL
 
-            tvl = data.get("tvl", [{}])[-1].get("totalLiquidityUSD", 0)
 
-            result = {
-                "totalTVL": tvl,
-                "currency": "USD",
-            }
-            _set_cache(cache_key, result)
-            return result
+async def _refresh_cache_loop():
+    while True:
+        results = await asyncio.gather(
+            _fetch_eth_price.refresh(),
+            _fetch_etherfi_apy_data.refresh(),
+            _fetch_etherfi_tvl.refresh(),
+            return_exceptions=True,
+        )
+        for error in results:
+            # A failed refresh leaves the previous value in place until it expires
+            if isinstance(error, Exception):
+                print(f"Error refreshing live rates cache: {error}")
+        await asyncio.sleep(CACHE_REFRESH_INTERVAL)
 
-    except Exception as e:
-        print(f"Error fetching EtherFi TVL: {e}")
-        return {"totalTVL": 0, "currency": "USD"}
+
+def start_cache_refresh():
+    """Warm the live-rate caches now and keep them warm (call on application startup)"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_cache_loop())
 
 
 async def get_live_rates() -> Dict[str, any]:
@@ -188,17 +235,26 @@ async def get_live_rates() -> Dict[str, any]:
     Get all live rates in one call
     This is the main function to use in your API
     """
-    eth_price = await get_eth_price()
-    apy_data = await get_etherfi_apy_data()
-    weeth_rate = await get_weeth_exchange_rate()
-    tvl_data = await get_etherfi_tvl()
+    # The four sources are independent; fetch them concurrently
+    results = await asyncio.gather(
+        get_eth_price(),
+        get_etherfi_apy_data(),
+        get_weeth_exchange_rate(),
+        get_etherfi_tvl(),
+        return_exceptions=True,
+    )
+    fallbacks = (FALLBACK_ETH_PRICE, FALLBACK_APY, FALLBACK_WEETH_RATE, FALLBACK_TVL)
+    eth_price, apy_data, weeth_rate, tvl_data = (
+        fallback if isinstance(result, Exception) else result
+        for result, fallback in zip(results, fallbacks)
+    )
 
     return {
         "ethPrice": eth_price,
-        "apyStake": apy_data["apyStake"],
-        "apyLiquidUsd": apy_data["apyLiquidUsd"],
+        "apyStake": apy_data.apy_stake,
+        "apyLiquidUsd": apy_data.apy_liquid_usd,
         "weethExchangeRate": weeth_rate,
-        "totalTVL": tvl_data["totalTVL"],
+        "totalTVL": tvl_data.total_tvl,
         "borrowRate": 0.045,  # This would come from lending protocols
         "ltvWeeth": 0.50,  # Standard LTV for weETH
         "source": "live",
@@ -216,22 +272,23 @@ async def get_historical_prices(
     In production, this would query The Graph or similar indexer
     """
     # For now, return mock data with realistic variance
-    import random
-
     eth_price = await get_eth_price()
     base_price = eth_price if asset.upper() in ["ETH", "EETH", "WEETH"] else 1.0
 
+    # Simulate price movement with a random walk (±3% daily variance), walked
+    # back from today's price so each day compounds onto the next
+    now = datetime.now()
+    uniform = random.uniform
     history = []
-    for i in range(days):
-        # Simulate price movement with random walk
-        variance = random.uniform(-0.03, 0.03)  # ±3% daily variance
-        price = base_price * (1 + variance) ** (days - i)
-
+    factor = 1.0
+    for i in range(days - 1, -1, -1):
+        factor *= 1 + uniform(-0.03, 0.03)
         history.append({
-            "date": (datetime.now() - timedelta(days=days - i)).isoformat(),
-            "price": round(price, 2),
+            "date": (now - timedelta(days=days - i)).isoformat(),
+            "price": round(base_price * factor, 2),
         })
 
+    history.reverse()  # Oldest first
     return history
 
 
@@ -239,19 +296,19 @@ async def get_historical_prices(
 async def get_apy_history(days: int = 30) -> list[Dict[str, any]]:
     """Get historical APY data"""
     # Mock data - in production would query subgraph
-    import random
-
-    current_apy = (await get_etherfi_apy_data())["apyStake"]
+    current_apy = (await get_etherfi_apy_data()).apy_stake
 
+    # APY fluctuates less than price (±0.5% variance)
+    now = datetime.now()
+    uniform = random.uniform
     history = []
-    for i in range(days):
-        # APY fluctuates less than price
-        variance = random.uniform(-0.005, 0.005)  # ±0.5% variance
-        apy = max(0.01, current_apy * (1 + variance) ** (days - i))
-
+    factor = 1.0
+    for i in range(days - 1, -1, -1):
+        factor *= 1 + uniform(-0.005, 0.005)
         history.append({
-            "date": (datetime.now() - timedelta(days=days - i)).isoformat(),
-            "apy": round(apy, 4),
+            "date": (now - timedelta(days=days - i)).isoformat(),
+            "apy": round(max(0.01, current_apy * factor), 4),
         })
 
+    history.reverse()  # Oldest first
     return history
@@ -6,13 +6,16 @@ import math, json, os
 import httpx
 from dotenv import load_dotenv
 from etherfi_service import get_live_rates, get_historical_prices, get_apy_history
+import etherfi_service
+import defillama_client
+import uniswap_client
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import new modules
 try:
-    from database import init_db
+    from database import init_db, CREATE_SCHEMA_ON_START
     from api_endpoints import router as v2_router
     DB_AVAILABLE = True
 except ImportError as e:
@@ -61,7 +64,9 @@ app.add_middleware(
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    if DB_AVAILABLE:
+    if DB_AVAILABLE and not CREATE_SCHEMA_ON_START:
+        print("Skipping database initialization (CREATE_SCHEMA_ON_START=0)")
+    elif DB_AVAILABLE:
         try:
             init_db()
             print("Database initialized successfully")
@@ -70,6 +75,15 @@ async def startup_event():
     else:
         print("Running in legacy mode without database features")
 
+    etherfi_service.start_cache_refresh()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await etherfi_service.aclose()
+    await defillama_client.aclose()
+    await uniswap_client.aclose()
+
 # Include v2 API routes
 if DB_AVAILABLE:
     app.include_router(v2_router)
@@ -762,9 +776,9 @@ async def get_prices():
     Returns real-time prices with timestamps.
     """
     try:
-        from defillama_client import DefiLlamaClient
+        from defillama_client import get_defillama_client
 
-        client = DefiLlamaClient()
+        client = get_defillama_client()
         prices = await client.get_current_prices()
 
         # Format response to match frontend expectations
@@ -794,9 +808,9 @@ async def get_apy_rates():
     Returns APY rates with source attribution.
     """
     try:
-        from defillama_client import DefiLlamaClient
+        from defillama_client import get_defillama_client
 
-        client = DefiLlamaClient()
+        client = get_defillama_client()
         apy_data = await client.get_all_apys()
 
         # Format response to match frontend expectations
@@ -845,9 +859,9 @@ async def price_forecast(request: PriceForecastRequest):
     
     try:
         # Get current price
-        from defillama_client import DefiLlamaClient
+        from defillama_client import get_defillama_client
 
-        client = DefiLlamaClient()
+        client = get_defillama_client()
         prices = await client.get_current_prices()
         
         # Extract price from double-nested structure: prices[product]["price"]["price"]
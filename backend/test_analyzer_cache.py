@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Check that analyzer fetch caches never store fallback data
+Run: python test_analyzer_cache.py
+"""
+import asyncio
+import sys
+
+from enhanced_portfolio_analyzer import (
+    EnhancedPortfolioAnalyzer, _FALLBACK_PRICES, _FALLBACK_APY
+)
+from enhanced_risk_analysis import EnhancedRiskAnalyzer
+
+
+async def _failing_prices():
+    # DefiLlamaClient.get_current_prices swallows upstream errors and returns {}
+    return {}
+
+
+async def _failing_apys():
+    # DefiLlamaClient.get_all_apys returns {} when the yields request fails
+    return {}
+
+
+async def _live_prices():
+    return {
+        "eETH": {"price": 3400.0},
+        "weETH": {"price": 3550.0},
+        "ETHFI": {"price": 2.1}
+    }
+
+
+async def _live_apys():
+    return {
+        "eETH": {"apy_total": 3.4, "tvl_usd": 9_000_000_000},
+        "weETH": {"apy_total": 3.1, "tvl_usd": 7_000_000_000}
+    }
+
+
+async def test_defillama_failure_not_cached() -> bool:
+    analyzer = EnhancedPortfolioAnalyzer()
+    if analyzer.defillama is None:
+        print("[SKIP] DefiLlama client not available")
+        return True
+
+    fetches = (EnhancedPortfolioAnalyzer._fetch_current_prices, EnhancedPortfolioAnalyzer._fetch_apy_data)
+    for fetch in fetches:
+        fetch.cache_clear()
+
+    try:
+        analyzer.defillama.get_current_prices = _failing_prices
+        analyzer.defillama.get_all_apys = _failing_apys
+
+        assert await analyzer._get_current_prices() is _FALLBACK_PRICES
+        assert await analyzer._get_apy_data() is _FALLBACK_APY
+        assert all(fetch.cache_size() == 0 for fetch in fetches), "fallback data was cached"
+        print("[OK] DefiLlama failure falls back without writing a cache entry")
+
+        # The next call must reach DefiLlama again and cache the live values
+        analyzer.defillama.get_current_prices = _live_prices
+        analyzer.defillama.get_all_apys = _live_apys
+
+        prices = await analyzer._get_current_prices()
+        apy_data = await analyzer._get_apy_data()
+        assert prices["eETH"] == 3400.0 and apy_data["eETH"] == 3.4
+        assert all(fetch.cache_size() == 1 for fetch in fetches)
+        print("[OK] Live data is fetched and cached after the outage")
+        return True
+    except AssertionError as e:
+        print(f"[X] {str(e) or 'unexpected analyzer result'}")
+        return False
+    finally:
+        for fetch in fetches:
+            fetch.cache_clear()
+
+
+async def _failing_liquidity(trade_size_usd):
+    # UniswapClient.get_multi_chain_liquidity drops chains whose queries failed
+    return []
+
+
+async def test_uniswap_failure_not_cached() -> bool:
+    analyzer = EnhancedRiskAnalyzer()
+    if analyzer.uniswap_client is None:
+        print("[SKIP] Uniswap client not available")
+        return True
+
+    fetch = EnhancedRiskAnalyzer._fetch_liquidity_depth
+    fetch.cache_clear()
+
+    try:
+        analyzer.uniswap_client.get_multi_chain_liquidity = _failing_liquidity
+
+        depth = await analyzer.get_liquidity_depth_data(5000)
+        assert depth.chains == [] and depth.health_index == 75
+        assert fetch.cache_size() == 0, "fallback liquidity data was cached"
+        print("[OK] Uniswap failure falls back without writing a cache entry")
+        return True
+    except AssertionError as e:
+        print(f"[X] {str(e) or 'unexpected analyzer result'}")
+        return False
+    finally:
+        fetch.cache_clear()
+
+
+async def main() -> bool:
+    results = [await test_defillama_failure_not_cached(), await test_uniswap_failure_not_cached()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
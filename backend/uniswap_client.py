@@ -3,9 +3,11 @@ Uniswap V3 Subgraph Client for Liquidity Metrics
 Provides real liquidity depth, slippage estimates, and pool data
 Subgraph Docs: https://thegraph.com/docs/en/
 """
+import asyncio
+import json
 import httpx
+from contextlib import nullcontext
 from typing import Dict, List, Optional, Any
-from decimal import Decimal
 
 
 # The Graph endpoints for Uniswap V3
@@ -34,12 +36,120 @@ ETHERFI_TOKENS = {
     }
 }
 
+# GraphQL query to find weETH/WETH pools
+_POOLS_QUERY = """
+{{
+  pools(
+    where: {{
+      or: [
+        {{
+          token0: "{weeth_addr}",
+          token1: "{weth_addr}"
+        }},
+        {{
+          token0: "{weth_addr}",
+          token1: "{weeth_addr}"
+        }}
+      ]
+    }},
+    orderBy: totalValueLockedUSD,
+    orderDirection: desc,
+    first: 5
+  ) {{
+    id
+    token0 {{
+      id
+      symbol
+      decimals
+    }}
+    token1 {{
+      id
+      symbol
+      decimals
+    }}
+    feeTier
+    liquidity
+    totalValueLockedUSD
+    totalValueLockedToken0
+    totalValueLockedToken1
+    volumeUSD
+    token0Price
+    token1Price
+    tick
+  }}
+}}
+"""
+
+
+def _build_pools_query_bodies() -> Dict[str, bytes]:
+    """Encode the pools request body once per chain, with token addresses baked in"""
+    bodies = {}
+    for chain, tokens in ETHERFI_TOKENS.items():
+        weeth_addr = tokens.get("weETH", "").lower()
+        weth_addr = tokens.get("WETH", "").lower()
+        if weeth_addr and weth_addr:
+            query = _POOLS_QUERY.format(weeth_addr=weeth_addr, weth_addr=weth_addr)
+            bodies[chain] = json.dumps({"query": query}).encode()
+    return bodies
+
+
+_POOLS_QUERY_BODIES = _build_pools_query_bodies()
+_JSON_HEADERS = {"content-type": "application/json"}
+
+# Pool for the client an instance owns when none is injected
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+# Coalesced multi-chain fetches run on this module-owned client: they outlive the
+# caller that started them, so they must not use a client that caller may close
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_shared_client(timeout: float) -> httpx.AsyncClient:
+    """Get the module's pooled HTTP client, creating it on first use"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(timeout=timeout, limits=HTTP_LIMITS)
+    return _shared_client
+
+
+async def aclose():
+    """Close the shared HTTP client (call on application shutdown)"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
 
 class UniswapClient:
     """Client for querying Uniswap V3 liquidity data via The Graph"""
 
-    def __init__(self):
+    # In-flight multi-chain fetches shared by all instances, keyed by (event loop, trade size)
+    _inflight: Dict[tuple, "asyncio.Task"] = {}
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.timeout = 30
+        self.http_client = http_client
+        self._owned_client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the client this instance created (an injected client belongs to the caller)"""
+        if self._owned_client is not None:
+            await self._owned_client.aclose()
+            self._owned_client = None
+
+    def _session(self):
+        """Use the injected HTTP client if there is one, else this instance's persistent client"""
+        if self.http_client is not None:
+            return nullcontext(self.http_client)
+        if self._owned_client is None or self._owned_client.is_closed:
+            self._owned_client = httpx.AsyncClient(timeout=self.timeout, limits=HTTP_LIMITS)
+        return nullcontext(self._owned_client)
 
     async def query_subgraph(self, chain: str, query: str) -> Dict[str, Any]:
         """
@@ -52,14 +162,18 @@ class UniswapClient:
         Returns:
             Query results
         """
-        url = UNISWAP_SUBGRAPH_URLS.get(chain.lower())
+        return await self._post_query(chain, json.dumps({"query": query}).encode())
+
+    async def _post_query(self, chain: str, body: bytes) -> Dict[str, Any]:
+        """POST an already-encoded GraphQL request body; see query_subgraph"""
+        url = UNISWAP_SUBGRAPH_URLS.get(chain) or UNISWAP_SUBGRAPH_URLS.get(chain.lower())
         if not url:
             print(f"Unsupported chain: {chain}")
             return {}
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        async with self._session() as client:
             try:
-                response = await client.post(url, json={"query": query})
+                response = await client.post(url, content=body, headers=_JSON_HEADERS)
                 response.raise_for_status()
                 data = response.json()
                 return data.get("data", {})
@@ -80,58 +194,11 @@ class UniswapClient:
         Returns:
             List of pool data
         """
-        tokens = ETHERFI_TOKENS.get(chain, {})
-        weeth_addr = tokens.get("weETH", "").lower()
-        weth_addr = tokens.get("WETH", "").lower()
-
-        if not weeth_addr or not weth_addr:
+        body = _POOLS_QUERY_BODIES.get(chain)
+        if body is None:
             return []
 
-        # GraphQL query to find weETH/WETH pools
-        query = f"""
-        {{
-          pools(
-            where: {{
-              or: [
-                {{
-                  token0: "{weeth_addr}",
-                  token1: "{weth_addr}"
-                }},
-                {{
-                  token0: "{weth_addr}",
-                  token1: "{weeth_addr}"
-                }}
-              ]
-            }},
-            orderBy: totalValueLockedUSD,
-            orderDirection: desc,
-            first: 5
-          ) {{
-            id
-            token0 {{
-              id
-              symbol
-              decimals
-            }}
-            token1 {{
-              id
-              symbol
-              decimals
-            }}
-            feeTier
-            liquidity
-            totalValueLockedUSD
-            totalValueLockedToken0
-            totalValueLockedToken1
-            volumeUSD
-            token0Price
-            token1Price
-            tick
-          }}
-        }}
-        """
-
-        data = await self.query_subgraph(chain, query)
+        data = await self._post_query(chain, body)
         return data.get("pools", [])
 
     async def calculate_liquidity_metrics(
@@ -159,12 +226,13 @@ class UniswapClient:
                 "error": "No pools found"
             }
 
-        # Aggregate metrics across all pools
-        total_tvl = sum(float(pool.get("totalValueLockedUSD", 0)) for pool in pools)
-
+        # Aggregate metrics across all pools in the same pass that builds the details
+        total_tvl = 0.0
         pool_details = []
+        best_pool = None  # Lowest slippage
         for pool in pools:
             tvl = float(pool.get("totalValueLockedUSD", 0))
+            total_tvl += tvl
             fee_tier = int(pool.get("feeTier", 3000))  # Fee in basis points (3000 = 0.3%)
 
             # Estimate slippage based on TVL and trade size
@@ -177,7 +245,7 @@ class UniswapClient:
                 slippage_bps = 9999
                 est_fee = 0
 
-            pool_details.append({
+            detail = {
                 "pool_id": pool.get("id"),
                 "fee_tier": fee_tier / 10000,  # Convert to percentage
                 "tvl_usd": tvl,
@@ -187,10 +255,10 @@ class UniswapClient:
                 "est_fee_usd": round(est_fee, 2),
                 "token0": pool.get("token0", {}).get("symbol"),
                 "token1": pool.get("token1", {}).get("symbol")
-            })
-
-        # Find best pool (lowest slippage)
-        best_pool = min(pool_details, key=lambda x: x["slippage_bps"]) if pool_details else None
+            }
+            pool_details.append(detail)
+            if best_pool is None or slippage_bps < best_pool["slippage_bps"]:
+                best_pool = detail
 
         return {
             "chain": chain,
@@ -212,15 +280,28 @@ class UniswapClient:
         Returns:
             List of liquidity data for each chain
         """
+        # Coalesce identical concurrent requests (e.g. portfolio and risk analyzers in one dashboard load)
+        key = (asyncio.get_running_loop(), trade_size_usd)
+        task = UniswapClient._inflight.get(key)
+        if task is None:
+            fetcher = UniswapClient(http_client=_get_shared_client(self.timeout))
+            task = asyncio.ensure_future(fetcher._fetch_multi_chain_liquidity(trade_size_usd))
+            UniswapClient._inflight[key] = task
+            task.add_done_callback(lambda _: UniswapClient._inflight.pop(key, None))
+
+        # Shield so one caller timing out doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch_multi_chain_liquidity(self, trade_size_usd: float) -> List[Dict[str, Any]]:
+        """Query every supported chain concurrently; see get_multi_chain_liquidity"""
         chains = ["ethereum", "arbitrum", "base"]
-        results = []
 
-        for chain in chains:
-            metrics = await self.calculate_liquidity_metrics(chain, trade_size_usd)
-            if metrics.get("pools_found", 0) > 0:
-                results.append(metrics)
+        # Each chain is a separate subgraph endpoint, so query them concurrently
+        all_metrics = await asyncio.gather(
+            *(self.calculate_liquidity_metrics(chain, trade_size_usd) for chain in chains)
+        )
 
-        return results
+        return [metrics for metrics in all_metrics if metrics.get("pools_found", 0) > 0]
 
     async def get_liquidity_depth_score(self, total_tvl_usd: float) -> int:
         """
@@ -254,20 +335,20 @@ class UniswapClient:
 # Convenience functions
 async def get_weeth_liquidity(chain: str = "ethereum", trade_size: float = 10000) -> Dict[str, Any]:
     """Get weETH liquidity metrics for a specific chain"""
-    client = UniswapClient()
-    return await client.calculate_liquidity_metrics(chain, trade_size)
+    async with UniswapClient() as client:
+        return await client.calculate_liquidity_metrics(chain, trade_size)
 
 
 async def get_all_chain_liquidity(trade_size: float = 10000) -> List[Dict[str, Any]]:
     """Get weETH liquidity across all chains"""
-    client = UniswapClient()
-    return await client.get_multi_chain_liquidity(trade_size)
+    async with UniswapClient() as client:
+        return await client.get_multi_chain_liquidity(trade_size)
 
 
 async def get_best_liquidity_venue(trade_size: float = 10000) -> Dict[str, Any]:
     """Find the best venue for trading weETH"""
-    client = UniswapClient()
-    all_chain_data = await client.get_multi_chain_liquidity(trade_size)
+    async with UniswapClient() as client:
+        all_chain_data = await client.get_multi_chain_liquidity(trade_size)
 
     if not all_chain_data:
         return {"error": "No liquidity data available"}
@@ -330,5 +411,4 @@ async def test_uniswap_client():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_uniswap_client())